@@ -0,0 +1,13 @@
+import sys
+
+from src.table_selection.compact_catalog import export_members
+
+# Writes the level members of a schema file as memory-mappable arrays for CATALOG_COMPACT (see CATALOG_MEMBERS_PATH)
+
+if len(sys.argv) != 3:
+    print("Usage: python export_catalog_members.py <schema_file> <members_dir>")
+    sys.exit(1)
+
+levels = export_members(sys.argv[1], sys.argv[2])
+
+print(f"Exported the members of {levels} levels of {sys.argv[1]} to {sys.argv[2]}")
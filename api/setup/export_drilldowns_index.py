@@ -0,0 +1,14 @@
+import sys
+
+from src.utils.vector_index import DrilldownIndex
+
+# Exports the drilldowns table as a memory-mappable index for the API (see DRILLDOWNS_INDEX_PATH)
+
+if len(sys.argv) != 2:
+    print("Usage: python export_drilldowns_index.py <output_dir>")
+    sys.exit(1)
+
+index = DrilldownIndex.from_database()
+index.save(sys.argv[1])
+
+print(f"Exported {len(index.members)} levels, {index.embeddings.shape[0]} members to {sys.argv[1]}")
@@ -0,0 +1,14 @@
+import sys
+
+from src.utils.embedding_backends import export_onnx_model
+
+# Exports an embedding model to ONNX (plus an int8 quantized copy) for EMBEDDING_BACKEND=onnx
+
+if len(sys.argv) != 3:
+    print("Usage: python export_onnx_model.py <model_name> <output_dir>")
+    sys.exit(1)
+
+model_name = sys.argv[1]
+output_dir = sys.argv[2]
+
+export_onnx_model(model_name, f"{output_dir}/{model_name}")
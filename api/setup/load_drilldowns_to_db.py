@@ -1,10 +1,15 @@
+import hashlib
+import io
 import json
 import pandas as pd
 import requests
 import urllib.parse
 
+from concurrent.futures import ThreadPoolExecutor
+
 from src.config import POSTGRES_ENGINE, SCHEMA_DRILLDOWNS, DRILLDOWNS_TABLE_NAME
-from src.utils.similarity_search import embedding
+from src.utils.similarity_search import get_embedding_model
+from tesseract_fetcher import fetch_json_concurrently
 
 # ENV Variables
 
@@ -12,11 +17,16 @@ TESSERACT_API = 'https://api.datasaudi.datawheel.us/tesseract/'
 table_name = DRILLDOWNS_TABLE_NAME
 schema_name = SCHEMA_DRILLDOWNS
 embedding_size = 384
+copy_chunk_size = 5000
+
+drilldown_columns = ['drilldown_id', 'drilldown_name', 'cube_name', 'drilldown', 'content_hash']
 
 
 def create_table(table_name, schema_name, embedding_size = 384):
     POSTGRES_ENGINE.execute(f"CREATE SCHEMA IF NOT EXISTS {schema_name}")
-    POSTGRES_ENGINE.execute(f"CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} (drilldown_id text, drilldown_name text, cube_name text, drilldown text, embedding vector({embedding_size}))")
+    POSTGRES_ENGINE.execute(f"CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} (drilldown_id text, drilldown_name text, cube_name text, drilldown text, embedding vector({embedding_size}), content_hash text)")
+    POSTGRES_ENGINE.execute(f"ALTER TABLE {schema_name}.{table_name} ADD COLUMN IF NOT EXISTS content_hash text")
+    POSTGRES_ENGINE.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_cube_drilldown_idx ON {schema_name}.{table_name} (cube_name, drilldown)")
     return
 
 
@@ -43,9 +53,100 @@ def get_api_params(api_url):
     return cube_name, drilldown
 
 
-def load_data_to_db(api_url, measure_name, table_name, schema_name):
+def _copy_value(value):
+    """
+    Formats a value for the COPY text format.
+    """
+    if pd.isna(value):
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_rows(df, embeddings):
+    """
+    Writes the rows of the dataframe and their embeddings into a buffer in the COPY text format.
+    """
+    buffer = io.StringIO()
+    for row, vector in zip(df[drilldown_columns].itertuples(index=False), embeddings):
+        values = [_copy_value(value) for value in row]
+        values.append('[' + ','.join(map(str, vector.tolist())) + ']')
+        buffer.write('\t'.join(values) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_embeddings_to_db(df, table_name, schema_name, chunk_size=copy_chunk_size):
+    """
+    Computes the embeddings of the drilldown names and streams the rows to the database with COPY, in chunks of chunk_size rows.
+    The embeddings of the next chunk are computed while the current one is being written.
+    """
+    model = get_embedding_model()
+    chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+    if not chunks:
+        return
+
+    copy_query = f"COPY {schema_name}.{table_name} ({', '.join(drilldown_columns)}, embedding) FROM STDIN WITH (FORMAT text)"
+
+    connection = POSTGRES_ENGINE.raw_connection()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(model.encode, chunks[0]['drilldown_name'].tolist())
+
+            for i, chunk in enumerate(chunks):
+                embeddings = pending.result()
+                if i + 1 < len(chunks):
+                    pending = executor.submit(model.encode, chunks[i + 1]['drilldown_name'].tolist())
+
+                cursor = connection.cursor()
+                cursor.copy_expert(copy_query, _copy_rows(chunk, embeddings))
+                cursor.close()
+                connection.commit()
+    finally:
+        connection.close()
+
+
+def content_hash(cube_name, drilldown, drilldown_id, drilldown_name):
+    """
+    Hash of the fields that determine a member's row, used to detect new and renamed members.
+    """
+    return hashlib.sha256('\x1f'.join(map(str, [cube_name, drilldown, drilldown_id, drilldown_name])).encode()).hexdigest()
+
+
+def get_stored_hashes(cube_name, drilldown, table_name, schema_name):
+    """
+    Returns a {drilldown_id: content_hash} dictionary with the members of the level already in the database.
+    """
+    query = f"SELECT drilldown_id, content_hash FROM {schema_name}.{table_name} WHERE cube_name = %(cube_name)s AND drilldown = %(drilldown)s"
+    df = pd.read_sql(query, con=POSTGRES_ENGINE, params={"cube_name": cube_name, "drilldown": drilldown})
+    return dict(zip(df['drilldown_id'], df['content_hash']))
+
+
+def delete_members(cube_name, drilldown, drilldown_ids, table_name, schema_name):
+    if not drilldown_ids:
+        return
+
+    connection = POSTGRES_ENGINE.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"DELETE FROM {schema_name}.{table_name} WHERE cube_name = %s AND drilldown = %s AND drilldown_id = ANY(%s)",
+            (cube_name, drilldown, list(drilldown_ids))
+        )
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def load_data_to_db(api_url, measure_name, table_name, schema_name, df=None):
+    """
+    Loads the members of the level requested by api_url, with their embeddings. If df is given, it is used instead of requesting the api.
+    Only new and renamed members are embedded and written, and members no longer returned by the api are deleted.
+    Returns a dictionary with the number of added, changed and removed members.
+    """
     cube_name, drilldown = get_api_params(api_url)
-    df = get_data_from_api(api_url=api_url)
+    if df is None:
+        df = get_data_from_api(api_url=api_url)
 
     df.rename(columns={f"{drilldown}": "drilldown_name", f"{drilldown} ID": "drilldown_id"}, inplace=True)
 
@@ -59,14 +160,25 @@ def load_data_to_db(api_url, measure_name, table_name, schema_name):
     df.replace('', pd.NA, inplace=True)
     df.dropna(subset=['drilldown_name', 'drilldown_id'], how='all', inplace=True)
 
-    df = df[['drilldown_id', 'drilldown_name', 'cube_name', 'drilldown']]
     df['drilldown_name'] = df['drilldown_name'].astype(str)
-    print(df.head())
+    df['drilldown_id'] = df['drilldown_id'].astype(str)
+    df = df.drop_duplicates(subset=['drilldown_id'])
+    df['content_hash'] = [content_hash(cube_name, drilldown, i, name) for i, name in zip(df['drilldown_id'], df['drilldown_name'])]
+    df = df[drilldown_columns]
 
-    df_embeddings = embedding(df, 'drilldown_name')
-    df_embeddings.to_sql(table_name, con=POSTGRES_ENGINE, if_exists='append', index=False, schema=schema_name)
+    stored_hashes = get_stored_hashes(cube_name, drilldown, table_name, schema_name)
 
-    return
+    added = df[~df['drilldown_id'].isin(stored_hashes.keys())]
+    changed = df[df['drilldown_id'].isin(stored_hashes.keys()) & (df['content_hash'] != df['drilldown_id'].map(stored_hashes))]
+    removed = set(stored_hashes.keys()) - set(df['drilldown_id'])
+
+    delete_members(cube_name, drilldown, set(changed['drilldown_id']) | removed, table_name, schema_name)
+    copy_embeddings_to_db(pd.concat([added, changed]), table_name, schema_name)
+
+    summary = {"added": len(added), "changed": len(changed), "removed": len(removed)}
+    print(f"{cube_name} - {drilldown}: {summary}")
+
+    return summary
 
 
 with open('tables.json', 'r') as file:
@@ -74,6 +186,9 @@ with open('tables.json', 'r') as file:
 
 create_table(table_name, schema_name)
 
+level_requests = {}
+measures = {}
+
 for table in cubes_json['tables']:
     cube_name = table['name']
     measure = table['measures'][0]['name']
@@ -81,4 +196,16 @@ for table in cubes_json['tables']:
         for hierarchy in dimension['hierarchies']:
             for level in hierarchy['levels']:
                 api_url = f"{TESSERACT_API}data.jsonrecords?cube={cube_name}&drilldowns={level}&measures={measure}"
-                load_data_to_db(api_url, measure, table_name, schema_name)
\ No newline at end of file
+                level_requests[(cube_name, level)] = api_url
+                measures[(cube_name, level)] = measure
+
+totals = {"added": 0, "changed": 0, "removed": 0}
+
+# levels are fetched concurrently and embedded and written as they arrive
+for key, api_url, response in fetch_json_concurrently(level_requests):
+    df = pd.DataFrame.from_dict(response['data'])
+    summary = load_data_to_db(api_url, measures[key], table_name, schema_name, df=df)
+    for k in totals:
+        totals[k] += summary[k]
+
+print(f"Drilldowns refresh finished. Added: {totals['added']}, changed: {totals['changed']}, removed: {totals['removed']}")
\ No newline at end of file
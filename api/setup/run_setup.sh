@@ -4,4 +4,10 @@ python schema_to_json.py
 
 python load_cubes_to_db.py
 
-python load_drilldowns_to_db.py
\ No newline at end of file
+python load_drilldowns_to_db.py
+
+# compact catalog: write the level members of the schema to CATALOG_MEMBERS_PATH,
+# then run the api with CATALOG_COMPACT=true (the catalog is still read from TABLES_PATH)
+if [ -n "$CATALOG_MEMBERS_PATH" ]; then
+    python export_catalog_members.py "${DATA_PATH}schema.json" "$CATALOG_MEMBERS_PATH"
+fi
@@ -4,6 +4,7 @@ import requests
 import xml.etree.ElementTree as ET
 
 from config import DATA_PATH, TESSERACT_API
+from tesseract_fetcher import fetch_json_concurrently
 
 def parse_xml_to_json(xml_file):
     """
@@ -89,6 +90,8 @@ def add_extra_entries(schema_json):
         """
         return "Label" if "Label" in member else "ID"
 
+    levels = {}
+
     for cube in schema_json["cubes"]:
         cube["api"] = "Tesseract"
         cube["default"] = {}
@@ -98,12 +101,17 @@ def add_extra_entries(schema_json):
             dimension["description"] = ""
             for hierarchy in dimension["hierarchies"]:
                 for level in hierarchy["levels"]:
-                    members = requests.get(TESSERACT_API + 'members.jsonrecords?cube={}&level={}'.format(cube["name"], level["name"])).json()["data"]
-                    members_list = [member[get_member_key(member)] for member in members]
-                    level["members"] = members_list
+                    levels[id(level)] = (level, TESSERACT_API + 'members.jsonrecords?cube={}&level={}'.format(cube["name"], level["name"]))
         for measure in cube["measures"]:
             measure["description"] = ""
 
+    member_requests = {key: url for key, (_, url) in levels.items()}
+
+    for key, _, response in fetch_json_concurrently(member_requests):
+        members = response["data"]
+        levels[key][0]["members"] = [member[get_member_key(member)] for member in members]
+        levels[key][0]["member_ids"] = [member["ID"] for member in members]
+
     return schema_json
 
 
@@ -0,0 +1,74 @@
+import requests
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import getenv
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, TimeoutError as Urllib3TimeoutError
+from urllib3.util.retry import Retry
+
+PARALLEL_REQUESTS = int(getenv("TESSERACT_PARALLEL_REQUESTS", "8"))
+# Seconds to wait for a Tesseract response (connecting or between received bytes) before the request fails
+REQUEST_TIMEOUT = float(getenv("TESSERACT_REQUEST_TIMEOUT", "60"))
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+
+
+def create_session(pool_size=PARALLEL_REQUESTS, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    Creates a requests session with a connection pool of pool_size connections,
+    that retries failed GET requests with exponential backoff.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_json(session, url, timeout=REQUEST_TIMEOUT):
+    r = session.get(url, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
+
+
+def is_timeout(error):
+    """
+    True if a request failed because the server did not respond in time, also when the timeout exhausted the session's retries
+    (requests then raises a ConnectionError wrapping the urllib3 timeout).
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    # a refused connection is a NewConnectionError, which urllib3 derives from its connect timeout error
+    return isinstance(reason, Urllib3TimeoutError) and not isinstance(reason, NewConnectionError)
+
+
+def fetch_json_concurrently(requests_by_key, parallel_requests=PARALLEL_REQUESTS, session=None, timeout=REQUEST_TIMEOUT):
+    """
+    Requests every url of the given {key: url} dictionary with up to parallel_requests requests in flight.
+    Yields (key, url, json) tuples as the responses arrive, so they can be processed while the rest are still being fetched.
+    A request that gets no response for timeout seconds (after its retries) fails, naming the url that timed out.
+    """
+    session = session or create_session(parallel_requests)
+
+    with ThreadPoolExecutor(max_workers=parallel_requests) as executor:
+        futures = {executor.submit(fetch_json, session, url, timeout): (key, url) for key, url in requests_by_key.items()}
+
+        for future in as_completed(futures):
+            key, url = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                if is_timeout(e):
+                    raise ValueError(f'Tesseract request timed out after {timeout}s:', url) from e
+                raise ValueError('Invalid API url:', url) from e
+            yield key, url, data
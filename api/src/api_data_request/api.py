@@ -4,6 +4,7 @@ import pandas as pd
 from config import MONDRIAN_API, TESSERACT_API
 from table_selection.table import *
 from utils.preprocessors.text import *
+from utils.member_lookup import get_level_members
 from utils.similarity_search import *
 
 class ApiBuilder:
@@ -94,18 +95,77 @@ class ApiBuilder:
         return self.build_url()
 
 
-def cuts_processing(cuts, table, table_manager, api):
-    
+TIME_VARIABLES = ["Year", "Month", "Quarter", "Month and Year", "Time"]
+
+
+def resolve_cut_lexically(cut, table, var_levels):
+    """
+    Tries to resolve a cut value against the members of the given levels without the embedding model:
+    first by exact or case-folded name, then by unique prefix, then by trigram similarity.
+    Returns (drilldown_id, drilldown_name, similarity, tier), or None if no tier matched.
+    """
+    if not var_levels:
+        return None
+
+    levels = [(level, get_level_members(table, level)) for level in var_levels]
+
+    for level, members in levels:
+        i = members.match_exact(cut)
+        if i is not None:
+            return members.ids[i], level, 1.0, "exact"
+
+    for level, members in levels:
+        i = members.match_prefix(cut)
+        if i is not None:
+            return members.ids[i], level, len(cut) / len(members.names[i]), "prefix"
+
+    best = None
+    for level, members in levels:
+        i, similarity = members.match_trigram(cut)
+        if i is not None and (best is None or similarity > best[2]):
+            best = (members.ids[i], level, similarity, "trigram")
+
+    return best
+
+
+def cuts_processing(cuts, table, table_manager, api, batched=True, lexical=True):
+    """
+    Resolves the filters obtained from the LLM into drilldown ids and adds them as cuts to the api instance.
+    Time filters are added as they are. The rest go through a resolver chain: a lexical match against the level members (with lexical=True),
+    and a similarity search for the filters it could not resolve.
+    With batched=True all filters that need the similarity search are resolved with a single encode call and a single database query.
+    Returns a list of (variable, value, drilldown_id, drilldown_name, similarity, tier) tuples with the resolved filters.
+    """
+    parsed_cuts = []
+
     for i in range(len(cuts)):
         var = cuts[i].split('=')[0].strip()
         cut = cuts[i].split('=')[1].strip()
+        parsed_cuts.append((var, cut))
+
+    to_resolve = [(var, cut) for var, cut in parsed_cuts if var not in TIME_VARIABLES]
+    levels = [get_drilldown_levels(table_manager, table.name, var) for var, _ in to_resolve]
+
+    matches = [resolve_cut_lexically(cut, table, var_levels) if lexical else None for (_, cut), var_levels in zip(to_resolve, levels)]
+    pending = [i for i, match in enumerate(matches) if match is None]
 
-        var_levels = get_drilldown_levels(table_manager, table.name, var)
-        
-        if var == "Year" or var == "Month" or var == "Quarter" or var == "Month and Year" or var == "Time":
-                api.add_cut(var, cut)
+    if batched:
+        similar = get_similar_content_batch([to_resolve[i][1] for i in pending], table.name, [levels[i] for i in pending])
+    else:
+        similar = [get_similar_content(to_resolve[i][1], table.name, levels[i]) for i in pending]
+
+    for i, (drilldown_id, drilldown_name, similarity) in zip(pending, similar):
+        matches[i] = (drilldown_id, drilldown_name, similarity, "embedding")
+
+    matches = iter(matches)
+    resolved = []
+
+    for var, cut in parsed_cuts:
+        if var in TIME_VARIABLES:
+            api.add_cut(var, cut)
         else:
-            drilldown_id, drilldown_name, s = get_similar_content(cut, table.name, var_levels)
+            drilldown_id, drilldown_name, s, tier = next(matches)
+            resolved.append((var, cut, drilldown_id, drilldown_name, s, tier))
 
             if drilldown_name != var:
                 api.drilldowns.discard(var)
@@ -113,6 +173,10 @@ def cuts_processing(cuts, table, table_manager, api):
 
             api.add_cut(drilldown_name, drilldown_id)
 
+    print("Cuts:", resolved)
+
+    return resolved
+
 
 def api_build(table, table_manager, drilldowns, measures, cuts, limit = ""):
     """
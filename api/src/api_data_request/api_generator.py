@@ -1,15 +1,18 @@
+import asyncio
 import json
-import openai
-import requests
 import time
 
-from config import OLLAMA_API
+from config import OLLAMA_API, SCHEMA_TOKEN_BUDGET
 from table_selection.table import *
 from utils.preprocessors.text import *
 from utils.similarity_search import *
 from api_data_request.api import *
+from api_data_request.schema_pruning import prune_columns_description
+from utils.llm_client import get_llm_client
 
-def get_api_components_messages(table, model_author, natural_language_query = ""):
+def get_api_components_messages(table, model_author, natural_language_query = "", token_budget = SCHEMA_TOKEN_BUDGET):
+
+    columns_description = prune_columns_description(table, natural_language_query, token_budget)
 
     response_part = """
         {
@@ -25,7 +28,7 @@ def get_api_components_messages(table, model_author, natural_language_query = ""
 You are an expert data scientist working with data organized in a multidimensional format, such as in OLAP cubes.
 You are given the following JSON containing the dimensions and measures of a cube that contains data to answer a user's question. 
 ---------------------\n
-{table.columns_description()}
+{columns_description}
 ---------------------\n
 Your goal is to identify the variables, measures and filters needed in order to retrieve the data from the cube through an API.
 The variables available correspond to the values in the 'levels' key.
@@ -51,7 +54,7 @@ A few rules to take into consideration:\n
 
 Below you can find the metadata of the cube:
 ---------------------\n
-{table.columns_description()}
+{columns_description}
 ---------------------\n
 
 A few rules to take into consideration:\n
@@ -65,6 +68,52 @@ This is my question:
     return message
 
 
+def get_table_and_api_components_messages(tables, natural_language_query = "", token_budget = SCHEMA_TOKEN_BUDGET):
+    """
+    Prompt for the single-call mode: the schemas of the candidate tables, asking for the table and its API parameters in one answer.
+    """
+    columns_descriptions = "\n".join(
+        f"Description: {table.description}\n{prune_columns_description(table, natural_language_query, token_budget)}" for table in tables
+    )
+
+    response_part = """
+        {
+            "table": "",
+            "variables": [],
+            "measures": [],
+            "filters": []
+        }
+        """
+
+    message = f"""
+You are an expert data scientist working with data organized in a multidimensional format, such as in OLAP cubes.
+You are given the following list of cubes, with their dimensions and measures, that may contain data to answer a user's question.
+---------------------\n
+{columns_descriptions}
+---------------------\n
+Your goal is to select the most relevant cube, and to identify the variables, measures and filters needed in order to retrieve the data from that cube through an API.
+The variables available correspond to the values in the 'levels' key of the selected cube.
+You should respond in JSON format with your answer separated into the following fields:\n
+
+    \"table\" which is the name of the selected cube.\n
+    \"variables\" which is a list of strings that contain the variables.\n
+    \"measures\" which is a list of strings that contain the relevant measures.\n
+    \"filters\" which is a list of strings that contain the filters in the form of 'variable = filtered_value'.\n
+
+in your answer, provide the markdown formatted like this:\n
+```
+{response_part}
+```
+Provide only the table, variables, measures and filters, and nothing else before or after.\n
+A few rules to take into consideration:\n
+- Variables, measures and filters must belong to the selected cube.\n
+- You cannot apply filters to different variables with the same parent dimension. Choose only one (the most relevant or most granular)\n
+- For cases where the query requires to filter by a certain range of years or months, please specify all of them separately.
+"""
+
+    return message
+
+
 def get_model_author(model):
     """
     Identify Model Author for Model requests
@@ -89,16 +138,21 @@ def get_api_params_from_lm(natural_language_query, table = None, model="gpt-4",
     """
     Identify API parameters to retrieve the data using OpenAI models or Llama.
     """
+    return get_llm_client().run(get_api_params_from_lm_async(natural_language_query, table, model, top_matches))
+
+
+async def get_api_params_from_lm_async(natural_language_query, table = None, model="gpt-4", top_matches=False):
+    """
+    Async version of get_api_params_from_lm, must run on the LLM client's loop.
+    """
     start_time = time.time()
     model_author = get_model_author(model)
 
-    content = get_api_components_messages(table, model_author, natural_language_query)
+    # building the prompt may compute embeddings, so it is kept off the event loop
+    content = await asyncio.to_thread(get_api_components_messages, table, model_author, natural_language_query)
 
     # logic for openai models
     if model_author == "openai":
-        max_attempts = 5
-        attempts = 0
-
         messages = [{
             "role": "system",
             "content": content
@@ -108,28 +162,9 @@ def get_api_params_from_lm(natural_language_query, table = None, model="gpt-4",
             "role": "user",
             "content": natural_language_query
         })
-        
-        while attempts < max_attempts:
-            try:
-                response = openai.ChatCompletion.create(
-                    model = model,
-                    messages = messages,
-                    temperature = 0
-                    )
-            except openai.error.Timeout as e:
-                print(f"OpenAI API request timed out (attempt {attempts + 1}): {e}")
-            except openai.error.APIError as e:
-                print(f"OpenAI API returned an API Error (attempt {attempts + 1}): {e}")
-            except openai.error.APIConnectionError as e:
-                print(f"OpenAI API request failed to connect: {e}")
-            except openai.error.ServiceUnavailableError as e:
-                print(f"OpenAI API service unavailable: {e}")
-            else:
-                break
-            attempts += 1
-            time.sleep(1)
-
-        output_text = response['choices'][0]['message']['content']
+
+        output_text = await get_llm_client().chat_completion(model, messages, temperature=0, catalog_version=table.catalog_version, call_site="api_params")
+
         end_time = time.time()
         print("Duration:", end_time - start_time, "seconds")
         print("\nChatGPT response:", output_text)
@@ -148,11 +183,11 @@ def get_api_params_from_lm(natural_language_query, table = None, model="gpt-4",
             "prompt": content
         }
 
-        response = requests.post(url, json=payload)
+        response_text = await get_llm_client().post(url, payload, call_site="api_params")
         end_time = time.time()
         print("Duration:", end_time - start_time, "seconds")
-        print(response.text)
-        response = parse_response(response.text)
+        print(response_text)
+        response = parse_response(response_text)
         print(response)
         params = extract_text_from_markdown_triple_backticks(response)
 
@@ -164,4 +199,86 @@ def get_api_params_from_lm(natural_language_query, table = None, model="gpt-4",
         # logic: ask for model on the list, or use a default one
         status = "bad status"
 
-    return variables, measures, cuts
\ No newline at end of file
+    return variables, measures, cuts
+
+
+def _as_list(value, field):
+    """
+    Returns a parameter from the LM answer as a list of strings, a single string being taken as a one-item list.
+    """
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    raise ValueError(f"Expected a list of strings for {field}, got {value!r}")
+
+
+def validate_api_params(table, variables, measures, cuts):
+    """
+    Drops the variables, measures and filters returned by the LM that do not exist in the table.
+    Raises ValueError if a field is not a string or list of strings, or if no valid measure is left.
+    """
+    variables = _as_list(variables, "variables")
+    measures = _as_list(measures, "measures")
+    cuts = _as_list(cuts, "filters")
+
+    valid_variables = [var for var in variables if table.get_dimension_hierarchies(var) is not None]
+    valid_measures = [measure for measure in measures if table.get_measure(measure) is not None]
+    valid_cuts = [
+        cut for cut in cuts
+        if '=' in cut and (cut.split('=')[0].strip() in TIME_VARIABLES or table.get_dimension_hierarchies(cut.split('=')[0].strip()) is not None)
+    ]
+
+    dropped = [item for item in variables + measures + cuts if item not in valid_variables + valid_measures + valid_cuts]
+    if dropped:
+        print(f"Dropped parameters not found in table {table.name}:", dropped)
+
+    if not valid_measures:
+        raise ValueError(f"None of the measures {measures} exist in table {table.name}")
+
+    return valid_variables, valid_measures, valid_cuts
+
+
+def get_table_and_api_params_from_lm(natural_language_query, table_manager, table_names, model="gpt-4"):
+    """
+    Single-call mode: selects the table among table_names and identifies its API parameters with one OpenAI request.
+    Returns the selected table and the validated variables, measures and filters.
+    """
+    return get_llm_client().run(get_table_and_api_params_from_lm_async(natural_language_query, table_manager, table_names, model))
+
+
+async def get_table_and_api_params_from_lm_async(natural_language_query, table_manager, table_names, model="gpt-4"):
+    """
+    Async version of get_table_and_api_params_from_lm, must run on the LLM client's loop.
+    """
+    if get_model_author(model) != "openai":
+        raise ValueError(f"Single-call mode is only available for OpenAI models, got {model}")
+
+    start_time = time.time()
+    tables = [table_manager.get_table(name) for name in table_names]
+
+    content = await asyncio.to_thread(get_table_and_api_components_messages, tables, natural_language_query)
+
+    messages = [
+        {"role": "system", "content": content},
+        {"role": "user", "content": natural_language_query}
+    ]
+
+    output_text = await get_llm_client().chat_completion(model, messages, temperature=0, catalog_version=table_manager.version, call_site="single_call")
+
+    end_time = time.time()
+    print("Duration:", end_time - start_time, "seconds")
+    print("\nChatGPT response:", output_text)
+    params = json.loads(extract_text_from_markdown_triple_backticks(output_text))
+    print("\nParameters:", params)
+
+    table_name = params.get("table")
+    if table_name not in table_names:
+        raise ValueError(f"Selected table {table_name} is not one of the candidates {table_names}")
+
+    table = table_manager.get_table(table_name)
+    variables, measures, cuts = validate_api_params(table, params.get("variables"), params.get("measures"), params.get("filters"))
+
+    return table, variables, measures, cuts
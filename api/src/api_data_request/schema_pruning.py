@@ -0,0 +1,92 @@
+import numpy as np
+import tiktoken
+
+from api_data_request.api import TIME_VARIABLES
+from utils.similarity_search import encode_texts
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-4"):
+    """
+    Counts the tokens of a text with the tokenizer of the given OpenAI model.
+    """
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        _encodings[model] = encoding
+    return len(encoding.encode(text))
+
+
+def is_time_dimension(dimension):
+    levels = dimension['hierarchies'][0]['levels'] if 'hierarchies' in dimension else []
+    return dimension['name'] in TIME_VARIABLES or any(level in TIME_VARIABLES for level in levels)
+
+
+def _similarities(natural_language_query, texts):
+    if not texts:
+        return np.empty(0)
+    vectors = encode_texts([natural_language_query] + texts)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    return vectors[1:] @ vectors[0]
+
+
+def prune_columns_description(table, natural_language_query, token_budget=None, model="gpt-4"):
+    """
+    Returns the columns description of the table for the API-parameters prompt, pruned to fit token_budget tokens.
+    Dimensions and measures are ranked by the embedding similarity of their description to the question, and added from the most similar
+    while they fit in the budget. Time dimensions and the most similar measure are always kept, and the catalog order is preserved.
+    """
+    full_description = table.columns_description()
+
+    if not token_budget or not natural_language_query:
+        return full_description
+
+    full_tokens = count_tokens(full_description, model)
+    if full_tokens <= token_budget:
+        print(f"Schema prompt tokens: {full_tokens} (budget {token_budget}, not pruned)")
+        return full_description
+
+    dimensions = list(table.dimensions)
+    measures = list(table.measures)
+
+    dimension_texts = [table.columns_description_subset([dimension], []) for dimension in dimensions]
+    measure_texts = [table.columns_description_subset([], [measure]) for measure in measures]
+    base_tokens = count_tokens(table.columns_description_subset([], []), model)
+
+    dimension_scores = _similarities(natural_language_query, [f"{d['name']} ({d.get('description', '')})" for d in dimensions])
+    measure_scores = _similarities(natural_language_query, [f"{m['name']} ({m.get('description', '')})" for m in measures])
+
+    # each candidate is (score, kind, position, tokens), the token cost of a dimension or measure is the cost of its line in the description
+    candidates = [(dimension_scores[i], "dimension", i, count_tokens(text, model) - base_tokens) for i, text in enumerate(dimension_texts)]
+    candidates += [(measure_scores[i], "measure", i, count_tokens(text, model) - base_tokens) for i, text in enumerate(measure_texts)]
+
+    selected = {"dimension": set(), "measure": set()}
+    used_tokens = base_tokens
+
+    required = [c for c in candidates if c[1] == "dimension" and is_time_dimension(dimensions[c[2]])]
+    required += sorted([c for c in candidates if c[1] == "measure"], key=lambda c: -c[0])[:1]
+
+    for _, kind, position, tokens in required:
+        selected[kind].add(position)
+        used_tokens += tokens
+
+    for _, kind, position, tokens in sorted(candidates, key=lambda c: -c[0]):
+        if position in selected[kind]:
+            continue
+        if used_tokens + tokens <= token_budget:
+            selected[kind].add(position)
+            used_tokens += tokens
+
+    pruned_description = table.columns_description_subset(
+        [dimension for i, dimension in enumerate(dimensions) if i in selected["dimension"]],
+        [measure for i, measure in enumerate(measures) if i in selected["measure"]]
+    )
+
+    print(f"Schema prompt tokens: {full_tokens} -> {count_tokens(pruned_description, model)} (budget {token_budget}), "
+          f"kept {len(selected['dimension'])}/{len(dimensions)} dimensions and {len(selected['measure'])}/{len(measures)} measures")
+
+    return pruned_description
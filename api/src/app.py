@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 from os import getenv
@@ -6,18 +7,97 @@ from table_selection.table_selector import *
 from table_selection.table import *
 from api_data_request.api_generator import *
 from data_analysis.data_analysis import *
+from utils.answer_cache import answer_cache
 from utils.logs import *
+from config import ANSWER_CACHE, PIPELINE_MODE, SPECULATIVE_MAX_PARALLEL
+
+# "two_call": table selection and API parameters in separate LLM calls, "single": both in one call over the top candidate tables,
+# "speculative": table selection with the API parameters of the top candidates extracted concurrently
+PIPELINE_MODES = ("two_call", "single", "speculative")
+
+def select_table_and_params(query, manager, content_limit=3):
+    """
+    Single-call mode: the top candidate tables are sent in one prompt, and the LLM returns the table and its parameters together.
+    """
+    scored_tables = get_relevant_tables_from_database(query, content_limit = content_limit, table_manager = manager, with_scores = True)
+    print("\nTable candidates:", scored_tables)
+
+    if is_confident_table_match(scored_tables):
+        count_table_selection("single", "shortcut")
+        scored_tables = scored_tables[:1]
+    else:
+        count_table_selection("single", "llm")
+
+    return get_table_and_api_params_from_lm(query, manager, [name for name, _ in scored_tables], model = 'gpt-4')
+
+async def _select_table_and_params_speculatively(query, manager, table_names, max_parallel):
+    selection = asyncio.create_task(get_relevant_tables_from_lm_async(query, manager, table_names))
+    speculative = {
+        name: asyncio.create_task(get_api_params_from_lm_async(query, manager.get_table(name), model = 'gpt-4'))
+        for name in table_names[:max_parallel]
+    }
+
+    try:
+        selected = await selection
+        table = manager.get_table(selected)
+
+        for name, task in speculative.items():
+            if name != selected:
+                task.cancel()
+
+        if selected in speculative:
+            variables, measures, cuts = await speculative[selected]
+        else:
+            print(f"Selected table {selected} was not extracted speculatively")
+            variables, measures, cuts = await get_api_params_from_lm_async(query, table, model = 'gpt-4')
+    finally:
+        for task in speculative.values():
+            task.cancel()
+        await asyncio.gather(*speculative.values(), return_exceptions=True)
+
+    return table, variables, measures, cuts
+
+def select_table_and_params_speculatively(query, manager, content_limit=3, max_parallel=SPECULATIVE_MAX_PARALLEL):
+    """
+    Speculative mode: while the LLM selects the table among the top candidates, the API parameters of up to max_parallel candidates
+    are extracted concurrently. The result of the selected table is kept and the other calls are cancelled.
+    """
+    scored_tables = get_relevant_tables_from_database(query, content_limit = content_limit, table_manager = manager, with_scores = True)
+    print("\nTable candidates:", scored_tables)
+
+    if is_confident_table_match(scored_tables):
+        count_table_selection("speculative", "shortcut")
+        table = manager.get_table(scored_tables[0][0])
+        return (table,) + get_api_params_from_lm(query, table, model = 'gpt-4')
+
+    count_table_selection("speculative", "llm")
+    table_names = [name for name, _ in scored_tables]
+    return get_llm_client().run(_select_table_and_params_speculatively(query, manager, table_names, max_parallel))
+
+def get_api(query, TABLES_PATH, mode=PIPELINE_MODE, on_token=None):
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode {mode}, expected one of {PIPELINE_MODES}")
 
-def get_api(query, TABLES_PATH):
     start_time = time.time()
 
-    manager = TableManager(TABLES_PATH)
-    table = request_tables_to_lm_from_db(query, manager)
-    variables, measures, cuts = get_api_params_from_lm(query, table, model = 'gpt-4')
+    manager = get_table_manager(TABLES_PATH)
+
+    if ANSWER_CACHE:
+        cached = answer_cache.lookup(query, manager.version)
+        if cached is not None:
+            return cached
+
+    if mode == "single":
+        table, variables, measures, cuts = select_table_and_params(query, manager)
+    elif mode == "speculative":
+        table, variables, measures, cuts = select_table_and_params_speculatively(query, manager)
+    else:
+        table = request_tables_to_lm_from_db(query, manager)
+        variables, measures, cuts = get_api_params_from_lm(query, table, model = 'gpt-4')
 
     api = api_build(table, manager, variables, measures, cuts)
     api_url = api.build_url()
-    print("API:", api_url)
+    print(f"API ({mode} mode):", api_url)
     
     data, df, response = api.fetch_data()
     end_time = time.time()
@@ -28,8 +108,10 @@ def get_api(query, TABLES_PATH):
         return api_url, data, response
     
     else:
-        response = agent_answer(df, query)
+        response = agent_answer(df, query, on_token=on_token)
         log_apicall(query, api_url, response, variables, measures, cuts, table, duration)
+        if ANSWER_CACHE:
+            answer_cache.put(query, (api_url, data, response), manager.version, table.cache_ttl)
         return api_url, data, response
     
 if __name__ == "__main__":
@@ -34,6 +34,26 @@ else:
     print("OPENAI_KEY not found, please check your environment")
     exit(1)
 
+# LLM client: max concurrent calls, per-attempt timeout (seconds) and connection pool size
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(getenv("LLM_TIMEOUT", "60"))
+LLM_POOL_SIZE = int(getenv("LLM_POOL_SIZE", "32"))
+
+# LLM retry policy: attempts and deadline (seconds) per request, exponential backoff bounds (seconds), and hedging of calls
+# slower than the LLM_HEDGE_QUANTILE latency of recent calls
+LLM_MAX_ATTEMPTS = int(getenv("LLM_MAX_ATTEMPTS", "5"))
+LLM_DEADLINE = float(getenv("LLM_DEADLINE", "120"))
+LLM_RETRY_BASE_DELAY = float(getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_HEDGING = getenv("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(getenv("LLM_HEDGE_QUANTILE", "0.95"))
+
+# LLM response cache for temperature 0 completions (in memory, optionally persisted to a local SQLite file)
+LLM_CACHE = getenv("LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_SIZE = int(getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_PATH = getenv("LLM_CACHE_PATH")
+
 # OLLAMA Connection
 OLLAMA_API = getenv("OLLAMA_API")
 
@@ -43,7 +63,67 @@ TESSERACT_API = getenv("TESSERACT_API")
 # Mondrian Connection
 MONDRIAN_API = getenv("MONDRIAN_API")
 
+# Embedding backend ("torch" or "onnx"), ONNX models are read from EMBEDDING_ONNX_PATH/<model name>
+EMBEDDING_BACKEND = getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_PATH = getenv("EMBEDDING_ONNX_PATH")
+EMBEDDING_ONNX_QUANTIZED = getenv("EMBEDDING_ONNX_QUANTIZED", "false").lower() == "true"
+
+# Cross-request embedding micro-batching
+EMBEDDING_BATCHING = getenv("EMBEDDING_BATCHING", "false").lower() == "true"
+EMBEDDING_BATCH_SIZE = int(getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WAIT_MS = float(getenv("EMBEDDING_BATCH_WAIT_MS", "2"))
+
+# Embedding cache (in memory, optionally persisted to a local SQLite file)
+EMBEDDING_CACHE_SIZE = int(getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = getenv("EMBEDDING_CACHE_PATH")
+
+# Token budget for the cube schema in the API-parameters prompt (unset disables pruning)
+SCHEMA_TOKEN_BUDGET = int(getenv("SCHEMA_TOKEN_BUDGET")) if getenv("SCHEMA_TOKEN_BUDGET") else None
+
+# Default pipeline mode of get_api: "two_call" (table selection, then API parameters), "single" (both in one LLM call)
+# or "speculative" (API parameters of up to SPECULATIVE_MAX_PARALLEL candidate tables extracted while the table is selected)
+PIPELINE_MODE = getenv("PIPELINE_MODE", "two_call")
+SPECULATIVE_MAX_PARALLEL = int(getenv("SPECULATIVE_MAX_PARALLEL", "3"))
+
+# Table selection skips the LLM when the top embedding match has at least this similarity, or leads the second one by at least this margin
+# (unset disables each check)
+TABLE_SELECTION_MIN_SCORE = float(getenv("TABLE_SELECTION_MIN_SCORE")) if getenv("TABLE_SELECTION_MIN_SCORE") else None
+TABLE_SELECTION_MIN_MARGIN = float(getenv("TABLE_SELECTION_MIN_MARGIN")) if getenv("TABLE_SELECTION_MIN_MARGIN") else None
+
+# Semantic cache of get_api answers: similarity threshold for a hit, lower bound reported as near miss, and default entry TTL in seconds
+# (a table can set its own "cache_ttl" in tables.json according to how often its data is updated)
+ANSWER_CACHE = getenv("ANSWER_CACHE", "false").lower() == "true"
+ANSWER_CACHE_SIZE = int(getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_THRESHOLD = float(getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_NEAR_MISS = float(getenv("ANSWER_CACHE_NEAR_MISS", "0.85"))
+ANSWER_CACHE_TTL = float(getenv("ANSWER_CACHE_TTL", "3600"))
+
+# Local embedding classifier for the Langbot categories ("centroid" or "knn" over the category examples and elements), the LLM
+# classifiers are used when its best score is under INTENT_CLASSIFIER_THRESHOLD or leads the second one by less than INTENT_CLASSIFIER_MARGIN
+INTENT_CLASSIFIER = getenv("INTENT_CLASSIFIER", "true").lower() == "true"
+INTENT_CLASSIFIER_METHOD = getenv("INTENT_CLASSIFIER_METHOD", "knn")
+INTENT_CLASSIFIER_K = int(getenv("INTENT_CLASSIFIER_K", "2"))
+INTENT_CLASSIFIER_THRESHOLD = float(getenv("INTENT_CLASSIFIER_THRESHOLD", "0.6"))
+INTENT_CLASSIFIER_MARGIN = float(getenv("INTENT_CLASSIFIER_MARGIN", "0.05"))
+
 # Files Directories
 TABLES_PATH = getenv("TABLES_PATH")
 FEW_SHOT_PATH = getenv("FEW_SHOT_PATH")
-DATA_PATH = getenv("DATA_PATH")
\ No newline at end of file
+DATA_PATH = getenv("DATA_PATH")
+
+# Load TABLES_PATH with the compact catalog model. The level members used to resolve cut values are memory-mapped
+# from CATALOG_MEMBERS_PATH (written from the tesseract schema by setup/export_catalog_members.py)
+CATALOG_COMPACT = getenv("CATALOG_COMPACT", "false").lower() == "true"
+CATALOG_MEMBERS_PATH = getenv("CATALOG_MEMBERS_PATH")
+
+# Seconds between checks of TABLES_PATH for catalog changes (0 disables hot reload)
+CATALOG_RELOAD_INTERVAL = float(getenv("CATALOG_RELOAD_INTERVAL", "10"))
+
+# Seconds the level members used for the exact, prefix and trigram cut lookup are kept before being read again,
+# so members ingested after startup are seen (they are also dropped on every catalog reload)
+MEMBER_LOOKUP_TTL = float(getenv("MEMBER_LOOKUP_TTL", "3600"))
+
+# In-memory drilldowns index (optionally exported to / memory-mapped from DRILLDOWNS_INDEX_PATH). An exported index is reloaded
+# every CATALOG_RELOAD_INTERVAL seconds if its files changed, one built from the database is only read at startup
+DRILLDOWNS_INDEX = getenv("DRILLDOWNS_INDEX", "false").lower() == "true"
+DRILLDOWNS_INDEX_PATH = getenv("DRILLDOWNS_INDEX_PATH")
\ No newline at end of file
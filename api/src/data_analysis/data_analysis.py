@@ -1,9 +1,52 @@
+from langchain_core.callbacks.base import BaseCallbackHandler
 from langchain_experimental.agents import create_pandas_dataframe_agent
 from langchain_community.chat_models import ChatOpenAI
 
 from config import OPENAI_KEY
 
-def agent_answer(df, natural_language_query):
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """
+    Passes to on_token the tokens of the agent's final answer, i.e. what the LLM writes after "Final Answer:".
+    The tokens of the intermediate reasoning steps are not passed.
+    """
+    answer_prefix = "Final Answer:"
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.text = ""
+        self.sent = None
+        self.started = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.text = ""
+        self.sent = None
+        self.started = False
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, messages, **kwargs)
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.text += token
+
+        if self.sent is None:
+            position = self.text.find(self.answer_prefix)
+            if position < 0:
+                return
+            self.sent = position + len(self.answer_prefix)
+
+        new_text = self.text[self.sent:]
+        if not self.started:
+            new_text = new_text.lstrip()
+        if new_text:
+            self.on_token(new_text)
+            self.started = True
+        self.sent = len(self.text)
+
+
+def agent_answer(df, natural_language_query, on_token=None):
+    """
+    Answers the question with a pandas agent over df. If on_token is given, the tokens of the final answer are passed to it as they are generated.
+    """
 
     prompt = (
         f"""
@@ -21,7 +64,10 @@ def agent_answer(df, natural_language_query):
         """
     )
 
-    llm = ChatOpenAI(model_name='gpt-4-1106-preview', temperature=0, openai_api_key=OPENAI_KEY)
+    if on_token:
+        llm = ChatOpenAI(model_name='gpt-4-1106-preview', temperature=0, openai_api_key=OPENAI_KEY, streaming=True, callbacks=[FinalAnswerStreamHandler(on_token)])
+    else:
+        llm = ChatOpenAI(model_name='gpt-4-1106-preview', temperature=0, openai_api_key=OPENAI_KEY)
 
     agent =  create_pandas_dataframe_agent(llm, df, verbose=True)
     response = agent.run(prompt)
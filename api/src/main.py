@@ -2,16 +2,47 @@
 import time
 import json
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from langchain_core.runnables import RunnableLambda, chain
-from app import get_api
-from config import TABLES_PATH
-from wrapper.lanbot import Langbot
+from app import PIPELINE_MODES, get_api
+from config import ANSWER_CACHE, INTENT_CLASSIFIER, PIPELINE_MODE, CATALOG_RELOAD_INTERVAL, DRILLDOWNS_INDEX, DRILLDOWNS_INDEX_PATH, EMBEDDING_BATCHING, TABLES_PATH
+from table_selection.catalog_watcher import CatalogWatcher
+from table_selection.table import get_table_manager
+from table_selection.table_selector import table_selection_stats
+from utils.answer_cache import answer_cache
+from utils.llm_client import get_llm_client
+from utils.member_lookup import clear_level_members
+from utils.similarity_search import embedding_cache, get_embedding_batcher, start_embedding_batchers, warm_embedding_models
+from utils.vector_index import load_drilldowns_index, refresh_drilldowns_index
+from wrapper.lanbot import Langbot, load_intent_classifier
 
 # fastapi instance declaration
 app = FastAPI()
 
+def on_catalog_reload(manager):
+    clear_level_members()
+
+def refresh_drilldowns():
+    # the lexical cut lookup reads the members from the index, so they are dropped with it
+    if refresh_drilldowns_index():
+        clear_level_members()
+
+@app.on_event("startup")
+def load_models():
+    warm_embedding_models()
+    if EMBEDDING_BATCHING:
+        start_embedding_batchers()
+    get_table_manager(TABLES_PATH).get_description_embeddings()
+    if INTENT_CLASSIFIER:
+        load_intent_classifier()
+    if DRILLDOWNS_INDEX:
+        load_drilldowns_index(DRILLDOWNS_INDEX_PATH)
+    if CATALOG_RELOAD_INTERVAL > 0:
+        checks = [refresh_drilldowns] if DRILLDOWNS_INDEX else []
+        CatalogWatcher(TABLES_PATH, CATALOG_RELOAD_INTERVAL, on_catalog_reload, checks).start()
+
 # api functions
 @app.get("/")
 async def root():
@@ -20,21 +51,38 @@ async def root():
         "status": "ok"
       }
 
+@app.get("/stats")
+async def stats():
+    batcher = get_embedding_batcher()
+    llm_cache = get_llm_client().cache
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": batcher.stats() if batcher else None,
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "llm_retry": get_llm_client().retry_policy.stats(),
+        "answer_cache": answer_cache.stats() if ANSWER_CACHE else None,
+        "table_selection": table_selection_stats
+      }
+
 @app.get("/wrap/{query}")
 async def wrap(query):
-    return StreamingResponse(Langbot(query, get_api, [], TABLES_PATH), media_type="application/json")
+    return StreamingResponse(Langbot(query, get_api, [], TABLES_PATH), media_type="application/x-ndjson")
 
 
 @app.get("/query/{query}")
-async def read_item(query: str):
-    api_url, data, text_response = get_api(query, TABLES_PATH)
+async def read_item(query: str, mode: str = PIPELINE_MODE):
+    if mode not in PIPELINE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {PIPELINE_MODES}")
+
+    api_url, data, text_response = await run_in_threadpool(get_api, query, TABLES_PATH, mode)
 
     return {
             "query":
                 {
                     "question": query, 
                     "answer": text_response, 
-                    "url": api_url
+                    "url": api_url,
+                    "mode": mode
                 }
             }
 
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+
+from table_selection.table import get_table_manager, reload_table_manager
+
+
+class CatalogWatcher:
+    """
+    Watches a tables file and reloads the process-wide TableManager when its content changes.
+    The file's mtime and size are polled every interval seconds, and its checksum is compared with the loaded catalog's version only when they change.
+    The new catalog is built in the watcher thread and swapped in atomically, so requests never wait for a reload.
+    on_reload, if given, is called with the new TableManager after each reload, to drop state derived from the previous catalog.
+    checks are extra functions called on every poll, to refresh other files that change without the catalog (e.g. the drilldowns index).
+    """
+
+    def __init__(self, tables_path, interval=10, on_reload=None, checks=()):
+        self.tables_path = tables_path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.checks = list(checks)
+        self.reloads = 0
+        self._stat = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _get_stat(self):
+        stat = os.stat(self.tables_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Catalog reload failed, keeping the current catalog: {e}")
+
+            for check in self.checks:
+                try:
+                    check()
+                except Exception as e:
+                    print(f"{check.__name__} failed: {e}")
+
+    def check(self):
+        """
+        Reloads the catalog if the tables file changed. Returns True if it was reloaded.
+        """
+        stat = self._get_stat()
+        if stat == self._stat:
+            return False
+
+        with open(self.tables_path, 'rb') as file:
+            checksum = hashlib.sha256(file.read()).hexdigest()
+
+        if checksum == get_table_manager(self.tables_path).version:
+            self._stat = stat
+            return False
+
+        manager = reload_table_manager(self.tables_path)
+        self._stat = stat
+        self.reloads += 1
+        print(f"Catalog reloaded from {self.tables_path}: {len(manager.tables)} tables, version {manager.version[:12]}")
+        if self.on_reload:
+            self.on_reload(manager)
+        return True
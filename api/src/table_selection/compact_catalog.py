@@ -0,0 +1,152 @@
+import hashlib
+import json
+import numpy as np
+import os
+import sys
+
+from table_selection.table import Table, TableManager
+
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _CatalogNode:
+    """
+    Slotted replacement for the catalog dicts loaded from JSON.
+    Supports the read-only dict access used by Table (node['name'], node.get('description', default), 'hierarchies' in node),
+    and keeps the distinction between a missing key and a None value.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        value = getattr(self, key, _MISSING) if key in self.__slots__ else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+
+class CompactMeasure(_CatalogNode):
+    __slots__ = ('name', 'description')
+
+    def __init__(self, data):
+        self.name = _intern(data['name'])
+        self.description = _intern(data.get('description', _MISSING))
+
+
+class CompactHierarchy(_CatalogNode):
+    __slots__ = ('name', 'description', 'levels')
+
+    def __init__(self, data):
+        self.name = _intern(data['name'])
+        self.description = _intern(data.get('description', _MISSING))
+        # levels are kept as a plain list of names, so prompts render exactly as with the JSON catalog
+        self.levels = [_intern(level['name'] if isinstance(level, dict) else level) for level in data.get('levels', [])]
+
+
+class CompactDimension(_CatalogNode):
+    __slots__ = ('name', 'description', 'hierarchies')
+
+    def __init__(self, data):
+        self.name = _intern(data['name'])
+        self.description = _intern(data.get('description', _MISSING))
+        self.hierarchies = [CompactHierarchy(hierarchy) for hierarchy in data['hierarchies']] if 'hierarchies' in data else _MISSING
+
+
+class CompactTable(Table):
+    """
+    Table built from slotted catalog nodes with interned strings instead of the raw JSON dicts.
+    Level members are not kept in the catalog: they are memory-mapped on first use from the arrays written by export_members.
+    """
+
+    def __init__(self, table_data, members_path=None):
+        self.name = _intern(table_data['name'])
+        self.api = _intern(table_data.get('api'))
+        self.description = table_data.get('description')
+        self.measures = [CompactMeasure(measure) for measure in table_data.get('measures', [])]
+        self.dimensions = [CompactDimension(dimension) for dimension in table_data.get('dimensions', [])]
+        self.cache_ttl = table_data.get('cache_ttl')
+        self.members_path = members_path
+        self.catalog_version = None
+        self._members = {}
+        self._descriptions = {}
+        self._build_indexes()
+
+    def get_level_members(self, level):
+        """
+        Returns the (ids, names) arrays of the members of a level, read-only, or None if they were not exported.
+        """
+        members = self._members.get(level)
+        if members is None and self.members_path:
+            ids_path, names_path = members_files(self.members_path, self.name, level)
+            if os.path.exists(ids_path) and os.path.exists(names_path):
+                members = (np.load(ids_path, mmap_mode='r'), np.load(names_path, mmap_mode='r'))
+                self._members[level] = members
+        return members
+
+
+class CompactTableManager(TableManager):
+    """
+    TableManager holding CompactTable objects.
+    """
+
+    def __init__(self, tables_path, members_path=None):
+        self.members_path = members_path
+        super().__init__(tables_path)
+
+    def load_tables(self):
+        with open(self.tables_path, 'rb') as file:
+            content = file.read()
+        self.version = hashlib.sha256(content).hexdigest()
+        data = json.loads(content)
+        return [CompactTable(table_data, self.members_path) for table_data in data.get('tables', [])]
+
+
+def members_files(members_path, cube_name, level):
+    """
+    Paths of the ids and names arrays of a level.
+    """
+    key = hashlib.sha1(f"{cube_name}\x1f{level}".encode()).hexdigest()
+    return os.path.join(members_path, f"{key}.ids.npy"), os.path.join(members_path, f"{key}.names.npy")
+
+
+def export_members(schema_path, members_path):
+    """
+    Writes the level members embedded in a schema file (see schema_to_json.add_extra_entries) as an ids and a names array per level.
+    The catalog itself is still read from the curated tables file, only the members are taken from the schema.
+    Returns the number of exported levels.
+    """
+    with open(schema_path, 'r') as f:
+        schema = json.load(f)
+
+    os.makedirs(members_path, exist_ok=True)
+    exported = 0
+
+    for cube in schema.get('cubes', []):
+        for dimension in cube.get('dimensions', []):
+            for hierarchy in dimension.get('hierarchies', []):
+                for level in hierarchy.get('levels', []):
+                    if isinstance(level, dict) and 'members' in level:
+                        names = [str(member) for member in level['members']]
+                        ids = [str(member) for member in level.get('member_ids', level['members'])]
+                        ids_path, names_path = members_files(members_path, cube['name'], level['name'])
+                        np.save(ids_path, np.array(ids, dtype=str))
+                        np.save(names_path, np.array(names, dtype=str))
+                        exported += 1
+
+    return exported
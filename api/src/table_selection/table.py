@@ -1,7 +1,35 @@
+import functools
+import hashlib
 import json
+import numpy as np
+import threading
 
+from collections import OrderedDict
 from typing import List
 
+# the catalog classes do not import config or the database (see get_description_embeddings), so setup scripts and
+# utils/helpers/catalog_benchmark.py can load a catalog without the app's credentials
+from utils.embedding_backends import DEFAULT_EMBEDDING_MODEL
+
+# Maximum number of multi-table schema blocks kept by each TableManager
+TABLE_SCHEMAS_CACHE_SIZE = 1024
+
+
+def _memoize_description(method):
+    """
+    Caches the description returned by a Table method on the instance.
+    Tables are not modified after loading (a catalog reload creates new ones), so descriptions are computed once per catalog version.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        description = self._descriptions.get(method.__name__)
+        if description is None:
+            description = method(self)
+            self._descriptions[method.__name__] = description
+        return description
+    return wrapper
+
+
 class Table:
     
     def __init__(self, table_data):
@@ -10,56 +38,90 @@ class Table:
         self.description = table_data.get('description')
         self.measures = table_data.get('measures', [])
         self.dimensions = table_data.get('dimensions', [])
+        self.cache_ttl = table_data.get('cache_ttl')
+        self.catalog_version = None
+        self._descriptions = {}
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """
+        Builds the name indexes used by the lookup methods. When names are repeated, the first occurrence wins, as in a linear scan.
+        """
+        self._measures_by_name = {}
+        for measure in self.measures:
+            self._measures_by_name.setdefault(measure['name'], measure)
+
+        self._dimensions_by_name = {}
+        self._levels_by_dimension_name = {}
+        self._levels_by_hierarchy_name = {}
+        self._levels_by_level_name = {}
+
+        for dimension in self.dimensions:
+            self._dimensions_by_name.setdefault(dimension['name'], dimension)
+            if "hierarchies" in dimension:
+                self._levels_by_dimension_name.setdefault(dimension['name'], dimension["hierarchies"][0]["levels"])
+
+            for hierarchy in dimension.get("hierarchies", []):
+                self._levels_by_hierarchy_name.setdefault(hierarchy['name'], hierarchy.get("levels"))
+                for level in hierarchy.get("levels", []):
+                    # levels are names in tables.json, but objects with a name in catalogs exported from the tesseract schema
+                    level_name = level if isinstance(level, str) else level.get('name')
+                    self._levels_by_level_name.setdefault(level_name, hierarchy["levels"])
+
+    def get_measure(self, measure_name):
+        return self._measures_by_name.get(measure_name)
 
     def get_measures_description(self, measure_name=None):
         if measure_name:
-            for measure in self.measures:
-                if measure['name'] == measure_name:
-                    return f"{measure['name']} ({measure.get('description', 'No description available')})\n"
+            measure = self._measures_by_name.get(measure_name)
+            if measure:
+                return f"{measure['name']} ({measure.get('description', 'No description available')})\n"
             return f"No description available for measure: {measure_name}"
         
         else: return [f"{measure['name']} ({measure.get('description', 'No description available')})\n" for measure in self.measures]
 
     def get_dimensions_description(self, dimension_name=None):
         if dimension_name:
-            for dimension in self.dimensions:
-                if dimension['name'] == dimension_name:
-                    return f"{dimension['name']} ({dimension.get('description', 'No description available')})\n"
+            dimension = self._dimensions_by_name.get(dimension_name)
+            if dimension:
+                return f"{dimension['name']} ({dimension.get('description', 'No description available')})\n"
             return f"No description available for dimension: {dimension_name}"
         
         else: return [f"{dimension['name']} ({dimension.get('description', 'No description available')})\n" for dimension in self.dimensions]
 
     def get_dimension_hierarchies(self, dimension_name):
-        for dimension in self.dimensions:
-            if dimension['name'] == dimension_name and "hierarchies" in dimension:
-                return dimension["hierarchies"][0]["levels"]
-
-        for dimension in self.dimensions:
-            for hierarchy in dimension.get("hierarchies", []):
-                if hierarchy['name'] == dimension_name:
-                    return hierarchy["levels"]
-
-        for dimension in self.dimensions:
-            for hierarchy in dimension.get("hierarchies", []):
-                if dimension_name in hierarchy.get("levels", []):
-                    return hierarchy["levels"]
+        """
+        Returns the levels of the hierarchy matching the given name, looked up as a dimension name first, then as a hierarchy name, then as a level name.
+        """
+        for index in (self._levels_by_dimension_name, self._levels_by_hierarchy_name, self._levels_by_level_name):
+            levels = index.get(dimension_name)
+            if levels is not None:
+                return levels
 
         return None
     
+    @_memoize_description
     def schema_description(self):
         dimensions_str = ", ".join([f"{var['name']} ({var.get('description', 'No description')})" for var in self.dimensions])
         measures_str = ", ".join([f"{measure['name']} ({measure.get('description', 'No description')})" for measure in self.measures])
         return f"Table Name: {self.name}\nDescription: {self.description}\nDimensions: {dimensions_str}\nMeasures: {measures_str}\n"
 
+    @_memoize_description
     def columns_description(self):
+        return self.columns_description_subset(self.dimensions, self.measures)
+
+    def columns_description_subset(self, dimensions, measures):
+        """
+        Same format as columns_description, restricted to the given dimensions and measures.
+        """
         dimensions_str_list = [
             f"{dimension['name']} ({dimension.get('description', 'No description')}) [Levels: {dimension['hierarchies'][0]['levels']}];\n" 
-            for dimension in self.dimensions
+            for dimension in dimensions
         ]
         
         measures_str_list = [
             f"{measure['name']} ({measure.get('description', 'No description')});\n"
-            for measure in self.measures
+            for measure in measures
         ]
         
         dimensions_str = ''.join(dimensions_str_list)
@@ -68,6 +130,7 @@ class Table:
         columns_str = f"Table Name: {self.name}\n" + "Dimensions:\n" + dimensions_str + "\nMeasures:\n" + measures_str
         return columns_str
     
+    @_memoize_description
     def columns_description_detailed(self):
         dimensions_str_list = [
             f"{dimension['name']} ({dimension.get('description', 'No description')}, {dimension['hierarchies'][0]['description']}) [Levels: {dimension['hierarchies'][0]['levels']}];\n" 
@@ -85,6 +148,7 @@ class Table:
         columns_str = f"Table Name: {self.name}\n" + "Dimensions:\n" + dimensions_str + "\nMeasures:\n" + measures_str
         return columns_str
 
+    @_memoize_description
     def __str__(self):
         measures_str = "".join(self.get_measures_description())
         dimensions_str = "".join(self.get_dimensions_description())
@@ -96,17 +160,24 @@ class TableManager:
     def __init__(self, tables_path):
         self.tables_path = tables_path
         self.tables = self.load_tables()
+        self._tables_by_name = {}
+        for table in self.tables:
+            table.catalog_version = self.version
+            self._tables_by_name.setdefault(table.name, table)
+        self._description_embeddings = {}
+        self._description_embeddings_lock = threading.Lock()
+        self._table_schemas = OrderedDict()
+        self._table_schemas_lock = threading.Lock()
 
     def load_tables(self):
-        with open(self.tables_path, 'r') as file:
-            data = json.load(file)
-            return [Table(table_data) for table_data in data.get('tables', [])]
+        with open(self.tables_path, 'rb') as file:
+            content = file.read()
+        self.version = hashlib.sha256(content).hexdigest()
+        data = json.loads(content)
+        return [Table(table_data) for table_data in data.get('tables', [])]
 
     def get_table(self, name):
-        for table in self.tables:
-            if table.name == name:
-                return table
-        return None
+        return self._tables_by_name.get(name)
 
     def list_tables(self):
         return [table.name for table in self.tables]
@@ -118,14 +189,131 @@ class TableManager:
         else:
             print("Table not found.")
 
+    def get_description_embeddings(self, embedding_model=DEFAULT_EMBEDDING_MODEL):
+        """
+        Returns a matrix with the L2-normalized embedding of each table description, in the same order as self.tables.
+        The matrix is computed once per manager (a catalog reload creates a new manager) and embedding model.
+        """
+        embeddings = self._description_embeddings.get(embedding_model)
+        if embeddings is not None:
+            return embeddings
+
+        with self._description_embeddings_lock:
+            embeddings = self._description_embeddings.get(embedding_model)
+            if embeddings is not None:
+                return embeddings
+
+            from utils.similarity_search import get_embedding_model
+
+            descriptions = [table.description or "" for table in self.tables]
+            model = get_embedding_model(embedding_model)
+            embeddings = np.asarray(model.encode(descriptions), dtype=np.float32).reshape(len(descriptions), -1)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            embeddings /= norms
+
+            self._description_embeddings[embedding_model] = embeddings
+
+        return embeddings
+
+    def get_similar_tables(self, vector, threshold=0, content_limit=1, embedding_model=DEFAULT_EMBEDDING_MODEL, with_scores=False) -> List[str]:
+        """
+        In-memory equivalent of the match_table function in the database.
+        Returns the names of the top content_limit tables whose description embedding has a cosine similarity to vector above threshold,
+        or (name, similarity) pairs if with_scores is set.
+        """
+        if not self.tables:
+            return []
+
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        scores = self.get_description_embeddings(embedding_model) @ vector
+        candidates = np.flatnonzero(scores > threshold)
+
+        if len(candidates) > content_limit:
+            top = np.argpartition(-scores[candidates], content_limit - 1)[:content_limit]
+            candidates = candidates[top]
+
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        if with_scores:
+            return [(self.tables[i].name, float(scores[i])) for i in candidates]
+        return [self.tables[i].name for i in candidates]
+
     def get_table_schemas(self, table_names: List[str] = None) -> str:
+        """
+        Returns the schema descriptions of the given tables (or all of them), in catalog order.
+        The block is cached per set of table names.
+        """
+        key = None if table_names is None else frozenset(table_names)
+
+        with self._table_schemas_lock:
+            schemas = self._table_schemas.get(key)
+            if schemas is not None:
+                self._table_schemas.move_to_end(key)
+                return schemas
+
         tables_str_list = []
         
         for table in self.tables:
             if table_names is None or table.name in table_names:
                 tables_str_list.append(table.schema_description())
         
-        return "\n\n".join(tables_str_list)
+        schemas = "\n\n".join(tables_str_list)
+
+        with self._table_schemas_lock:
+            self._table_schemas[key] = schemas
+            if len(self._table_schemas) > TABLE_SCHEMAS_CACHE_SIZE:
+                self._table_schemas.popitem(last=False)
+
+        return schemas
+
+
+_table_managers = {}
+_table_managers_lock = threading.Lock()
+
+
+def create_table_manager(tables_path):
+    """
+    Loads the tables file as a TableManager, or as a CompactTableManager when CATALOG_COMPACT is set.
+    """
+    from config import CATALOG_COMPACT, CATALOG_MEMBERS_PATH
+
+    if CATALOG_COMPACT:
+        from table_selection.compact_catalog import CompactTableManager
+        return CompactTableManager(tables_path, CATALOG_MEMBERS_PATH)
+    return TableManager(tables_path)
+
+
+def get_table_manager(tables_path):
+    """
+    Returns the process-wide TableManager for the given tables file, loading it only the first time it is requested.
+    """
+    manager = _table_managers.get(tables_path)
+    if manager is None:
+        with _table_managers_lock:
+            manager = _table_managers.get(tables_path)
+            if manager is None:
+                manager = create_table_manager(tables_path)
+                _table_managers[tables_path] = manager
+    return manager
+
+
+def reload_table_manager(tables_path):
+    """
+    Builds a new TableManager for the given tables file, with its description embeddings, and swaps it in as the process-wide one.
+    Requests that already hold the previous manager keep using it, so each request sees a consistent catalog.
+    """
+    manager = create_table_manager(tables_path)
+    manager.get_description_embeddings()
+
+    with _table_managers_lock:
+        _table_managers[tables_path] = manager
+
+    return manager
 
 
 def get_drilldown_levels(manager, table_name, dimension_name):
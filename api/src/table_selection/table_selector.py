@@ -1,15 +1,26 @@
 import json
-import openai
-import time
+import threading
 
 from typing import List
-from sentence_transformers import SentenceTransformer
 
+from config import TABLE_SELECTION_MIN_MARGIN, TABLE_SELECTION_MIN_SCORE
 from table_selection.table import *
-from utils.similarity_search import get_similar_tables
+from utils.similarity_search import DEFAULT_EMBEDDING_MODEL, encode_texts, get_similar_tables
 from utils.few_shot_examples import get_few_shot_example_messages
+from utils.llm_client import get_llm_client
 from utils.preprocessors.text import extract_text_from_markdown_triple_backticks
 
+# Number of table selections resolved by the embedding scores alone ("shortcut") and by the LLM ("llm"), per pipeline mode
+table_selection_stats = {}
+_table_selection_stats_lock = threading.Lock()
+
+
+def count_table_selection(mode, key):
+    with _table_selection_stats_lock:
+        counters = table_selection_stats.setdefault(mode, {"shortcut": 0, "llm": 0})
+        counters[key] += 1
+
+
 def _get_table_selection_message_with_descriptions(table_manager, table_names: List[str] = None):
     message = (
         f"""
@@ -45,14 +56,17 @@ def _get_table_selection_messages() -> List[str]:
     return default_messages
 
 
-def get_relevant_tables_from_database(natural_language_query, embedding_model = 'multi-qa-MiniLM-L6-cos-v1', content_limit = 1) -> List[str]:
+def get_relevant_tables_from_database(natural_language_query, embedding_model = DEFAULT_EMBEDDING_MODEL, content_limit = 1, table_manager = None, with_scores = False) -> List[str]:
     """
-    Returns a list of the top k table names (matches the embedding vector of the NLQ with the stored vectors of each table)
+    Returns a list of the top k table names (matches the embedding vector of the NLQ with the stored vectors of each table), or (name, similarity) pairs if with_scores is set.
+    If a table manager is given, tables are ranked in memory against its catalog instead of in the database.
     """
-    model = SentenceTransformer(embedding_model) # 384
-    vector = model.encode([natural_language_query])
+    vector = encode_texts([natural_language_query], embedding_model)
 
-    results = get_similar_tables(vector, content_limit=content_limit)
+    if table_manager is not None:
+        results = table_manager.get_similar_tables(vector[0], content_limit=content_limit, embedding_model=embedding_model, with_scores=with_scores)
+    else:
+        results = get_similar_tables(vector, content_limit=content_limit, with_scores=with_scores)
 
     return list(results)
 
@@ -61,9 +75,13 @@ def get_relevant_tables_from_lm(natural_language_query, table_manager, table_lis
     """
     Identify relevant tables for answering a natural language query via LM
     """
-    max_attempts = 5
-    attempts = 0
+    return get_llm_client().run(get_relevant_tables_from_lm_async(natural_language_query, table_manager, table_list, model))
+
 
+async def get_relevant_tables_from_lm_async(natural_language_query, table_manager, table_list = None, model = "gpt-4") -> List[str]:
+    """
+    Async version of get_relevant_tables_from_lm, must run on the LLM client's loop.
+    """
     content = _get_table_selection_message_with_descriptions(table_manager, table_list)
 
     messages = [{
@@ -75,28 +93,9 @@ def get_relevant_tables_from_lm(natural_language_query, table_manager, table_lis
         "role": "user",
         "content": natural_language_query
     })
-    
-    while attempts < max_attempts:
-        try:
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=messages,
-                temperature=0
-                )
-        except openai.error.Timeout as e:
-            print(f"OpenAI API request timed out (attempt {attempts + 1}): {e}")
-        except openai.error.APIError as e:
-            print(f"OpenAI API returned an API Error (attempt {attempts + 1}): {e}")
-        except openai.error.APIConnectionError as e:
-            print(f"OpenAI API request failed to connect: {e}")
-        except openai.error.ServiceUnavailableError as e:
-            print(f"OpenAI API service unavailable: {e}")
-        else:
-            break
-        attempts += 1
-        time.sleep(1)
-
-    output_text = response['choices'][0]['message']['content']
+
+    output_text = await get_llm_client().chat_completion(model, messages, temperature=0, catalog_version=table_manager.version, call_site="table_selection")
+
     print("\nChatGPT response:", output_text)
     tables_json_str = extract_text_from_markdown_triple_backticks(output_text)
     print("\nTables:", tables_json_str)
@@ -106,11 +105,38 @@ def get_relevant_tables_from_lm(natural_language_query, table_manager, table_lis
     return table_list
 
 
+def is_confident_table_match(scored_tables, min_score = TABLE_SELECTION_MIN_SCORE, min_margin = TABLE_SELECTION_MIN_MARGIN):
+    """
+    Returns True if the top (name, similarity) match is good enough to be used without asking the llm:
+    its similarity is at least min_score, or it is ahead of the second match by at least min_margin (unset values disable each check).
+    """
+    if not scored_tables:
+        return False
+
+    top_score = scored_tables[0][1]
+    if min_score is not None and top_score >= min_score:
+        return True
+
+    if min_margin is not None and len(scored_tables) > 1:
+        return top_score - scored_tables[1][1] >= min_margin
+
+    return False
+
+
 def request_tables_to_lm_from_db(natural_language_query, table_manager, content_limit=3):
     """
     Extracts most similar tables from database using embeddings and similarity functions, and then lets the llm choose the most relevant one.
+    The llm call is skipped when the top match is a confident one (see is_confident_table_match).
     """
-    tables = get_relevant_tables_from_database(natural_language_query, content_limit = content_limit)
+    scored_tables = get_relevant_tables_from_database(natural_language_query, content_limit = content_limit, table_manager = table_manager, with_scores = True)
+    print("\nTable candidates:", scored_tables)
+
+    if is_confident_table_match(scored_tables):
+        count_table_selection("two_call", "shortcut")
+        return table_manager.get_table(scored_tables[0][0])
+
+    count_table_selection("two_call", "llm")
+    tables = [name for name, _ in scored_tables]
     gpt_selected_table_str = get_relevant_tables_from_lm(natural_language_query, table_manager, table_list = tables)
 
     gpt_selected_table = table_manager.get_table(gpt_selected_table_str)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from utils.embedding_backends import OnnxEmbeddingBackend, SentenceTransformerBackend, export_onnx_model
+
+MODEL_NAME = 'multi-qa-MiniLM-L6-cos-v1'
+
+texts = [
+    'How much did the CPI of fresh fruits change between 2019 and 2021',
+    'How many dollars in electronics were transported from Texas to California during 2020 by truck?',
+    'Which party won the latest presidential election?',
+    'Texas',
+    '2020',
+    'Coal',
+    'Table Data_USA_House_election contains House election data, including number of votes by candidate, party and state.'
+]
+
+
+@pytest.fixture(scope="module")
+def onnx_dir(tmp_path_factory):
+    return export_onnx_model(MODEL_NAME, str(tmp_path_factory.mktemp("onnx") / MODEL_NAME))
+
+
+@pytest.fixture(scope="module")
+def torch_embeddings():
+    return SentenceTransformerBackend(MODEL_NAME).encode(texts)
+
+
+@pytest.mark.parametrize("quantized, min_similarity", [(False, 0.999), (True, 0.98)])
+def test_onnx_parity(onnx_dir, torch_embeddings, quantized, min_similarity):
+    onnx_embeddings = OnnxEmbeddingBackend(onnx_dir, quantized=quantized).encode(texts)
+
+    assert onnx_embeddings.shape == torch_embeddings.shape == (len(texts), 384)
+
+    similarities = np.sum(onnx_embeddings * torch_embeddings, axis=1) / (
+        np.linalg.norm(onnx_embeddings, axis=1) * np.linalg.norm(torch_embeddings, axis=1))
+    assert similarities.min() >= min_similarity, 'Similarities: {}'.format(similarities)
+
+    # nearest neighbours among the stored (torch) vectors must not change
+    assert (np.argmax(onnx_embeddings @ torch_embeddings.T, axis=1) == np.arange(len(texts))).all()
@@ -0,0 +1,100 @@
+import os
+import pytest
+import time
+
+pytest.importorskip("sentence_transformers")
+
+from wrapper.intent_classifier import IntentClassifier, LowConfidenceError
+from wrapper.lanbot import classifyOne, classifyTwo, intent_categories
+from wrapper_cases import test_cases
+
+# Offline comparison of the local intent classifier with the LLM classifiers on the wrapper test cases.
+# The LLM side needs the Ollama server, set INTENT_COMPARE_LLM=true to run it.
+
+MIN_CONFIDENT_ACCURACY = 0.8
+MIN_COVERAGE = 0.3
+
+
+def history(case):
+    return ' [AI]:Hi, ready to help you; [User]:' + ';[User]:'.join(case['conversation']) + '[.]'
+
+
+def question(case):
+    return ' '.join(case['conversation'])
+
+
+def is_example_case(case):
+    return any(question(case) in c.get('examples', []) for c in intent_categories)
+
+
+def evaluate(classify, cases):
+    """
+    Runs classify on every case and returns the number of answered cases, the correct ones and the mean latency in seconds.
+    classify returns the category, or None when it does not answer (low confidence).
+    """
+    answered, correct, durations = 0, 0, []
+
+    for case in cases:
+        start_time = time.time()
+        category = classify(case)
+        durations.append(time.time() - start_time)
+
+        if category is not None:
+            answered += 1
+            if category.lower() == case['expectedCategory'].lower():
+                correct += 1
+            else:
+                print('Wrong category for {}: {} (expected {})'.format(case['titleCase'], category, case['expectedCategory']))
+
+    return answered, correct, sum(durations) / len(durations)
+
+
+def without_example(text):
+    """
+    Category prompts without the given example, so a case built from an example is not classified against its own vector.
+    """
+    return [dict(c, examples=[e for e in c.get('examples', []) if e != text]) for c in intent_categories]
+
+
+def local_classify(method):
+    classifier = IntentClassifier(intent_categories, method=method)
+    held_out = {question(case): IntentClassifier(without_example(question(case)), method=method) for case in test_cases if is_example_case(case)}
+
+    def classify(case):
+        try:
+            return held_out.get(question(case), classifier).classify(question(case))['category']
+        except LowConfidenceError:
+            return None
+    return classify
+
+
+def report(name, cases, answered, correct, latency):
+    print('{}: answered {}/{} cases (coverage {:.2f}), {} correct (accuracy {:.2f}), mean latency {:.1f} ms'.format(
+        name, answered, len(cases), answered / len(cases), correct, correct / answered if answered else 0.0, latency * 1000))
+
+
+@pytest.mark.parametrize("method", ["centroid", "knn"])
+def test_intent_classifier(method):
+    classify = local_classify(method)
+
+    # cases built from the category examples are classified with that example left out
+    for name, cases in [('example cases', [c for c in test_cases if is_example_case(c)]),
+                        ('other cases', [c for c in test_cases if not is_example_case(c)])]:
+        report('{} {}'.format(method, name), cases, *evaluate(classify, cases))
+
+    answered, correct, latency = evaluate(classify, test_cases)
+    report(method, test_cases, answered, correct, latency)
+
+    # low confidence cases go to the LLM classifiers, so the answered ones must be right, and enough of them must be answered
+    assert answered / len(test_cases) >= MIN_COVERAGE
+    assert correct / answered >= MIN_CONFIDENT_ACCURACY
+
+
+@pytest.mark.skipif(os.getenv("INTENT_COMPARE_LLM", "false").lower() != "true", reason="needs the Ollama server")
+def test_compare_with_llm_classifier():
+    llm_chain = classifyOne.with_fallbacks(fallbacks = [classifyTwo])
+
+    report('llm', test_cases, *evaluate(lambda case: llm_chain.invoke({'history': history(case)})['category'], test_cases))
+
+    for method in ["centroid", "knn"]:
+        report(method, test_cases, *evaluate(local_classify(method), test_cases))
@@ -0,0 +1,29 @@
+from table_selection.table import Table
+
+table_data = {
+    "name": "Data_USA_House_election",
+    "description": "House election data",
+    "measures": [{"name": "Candidate Votes", "description": "Votes"}],
+    "dimensions": [
+        {
+            "name": "Geography",
+            "hierarchies": [
+                {"name": "State", "levels": [{"name": "State", "members": ["Texas", "Ohio"]}, {"name": "County"}]}
+            ]
+        },
+        {
+            "name": "Year",
+            "hierarchies": [{"name": "Year", "levels": ["Year"]}]
+        }
+    ]
+}
+
+
+def test_dimension_hierarchies_with_level_objects():
+    table = Table(table_data)
+    levels = table_data["dimensions"][0]["hierarchies"][0]["levels"]
+
+    assert table.get_dimension_hierarchies("Geography") is levels
+    assert table.get_dimension_hierarchies("County") is levels
+    assert table.get_dimension_hierarchies("Year") == ["Year"]
+    assert table.get_dimension_hierarchies("Party") is None
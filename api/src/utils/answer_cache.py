@@ -0,0 +1,106 @@
+import numpy as np
+import threading
+import time
+
+from collections import deque
+
+from config import ANSWER_CACHE_NEAR_MISS, ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL
+from utils.similarity_search import DEFAULT_EMBEDDING_MODEL, encode_texts
+
+
+class AnswerCache:
+    """
+    Semantic cache of get_api results.
+    Question embeddings are kept L2-normalized in one matrix, so a lookup is a single matrix-vector product; a stored result is
+    returned for a new question when their cosine similarity is at least threshold.
+    Each entry expires after its own ttl, and the whole cache is cleared when the catalog version changes. When the cache is
+    full the oldest entry is replaced.
+    Lookups whose best similarity falls in [near_miss_threshold, threshold) are recorded as near misses, to help tune the threshold.
+    """
+
+    def __init__(self, maxsize=1000, threshold=0.95, ttl=3600, near_miss_threshold=0.85, embedding_model=DEFAULT_EMBEDDING_MODEL):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.near_miss_threshold = near_miss_threshold
+        self.embedding_model = embedding_model
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = deque(maxlen=100)
+        self._vectors = None
+        self._expires_at = np.zeros(maxsize)
+        self._entries = [None] * maxsize
+        self._catalog_version = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def embed(self, question):
+        vector = encode_texts([question], self.embedding_model)[0]
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def lookup(self, question, catalog_version=None, vector=None):
+        """
+        Returns the cached (api_url, data, response) of the most similar earlier question, or None.
+        """
+        if vector is None:
+            vector = self.embed(question)
+        now = time.time()
+
+        with self._lock:
+            self._check_version(catalog_version)
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ vector
+            similarities[self._expires_at <= now] = -1
+
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            entry = self._entries[best]
+
+            if similarity >= self.threshold:
+                self.hits += 1
+                print(f"Answer cache hit: '{question}' ~ '{entry['question']}' (similarity {similarity:.4f})")
+                return entry['result']
+
+            self.misses += 1
+            if entry is not None and similarity >= self.near_miss_threshold:
+                self.near_misses.append({"question": question, "cached_question": entry['question'], "similarity": similarity})
+                print(f"Answer cache near miss: '{question}' ~ '{entry['question']}' (similarity {similarity:.4f}, threshold {self.threshold})")
+            return None
+
+    def put(self, question, result, catalog_version=None, ttl=None, vector=None):
+        if vector is None:
+            vector = self.embed(question)
+
+        with self._lock:
+            self._check_version(catalog_version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+
+            self._vectors[self._next] = vector
+            self._expires_at[self._next] = time.time() + (ttl if ttl is not None else self.ttl)
+            self._entries[self._next] = {"question": question, "result": result}
+            self._next = (self._next + 1) % self.maxsize
+
+    def _check_version(self, catalog_version):
+        if catalog_version != self._catalog_version:
+            self._expires_at[:] = 0
+            self._entries = [None] * self.maxsize
+            self._next = 0
+            self._catalog_version = catalog_version
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": int(np.count_nonzero(self._expires_at > time.time())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "threshold": self.threshold,
+            "near_misses": list(self.near_misses)
+        }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_NEAR_MISS)
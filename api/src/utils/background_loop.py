@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    Asyncio event loop running forever in a daemon thread, so asyncio components can be shared by synchronous code running in other threads.
+    """
+
+    def __init__(self, name):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        """
+        Schedules a coroutine on the loop and returns a concurrent.futures.Future with its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """
+        Runs a coroutine on the loop and blocks the calling thread until it finishes.
+        """
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """
+        Runs a coroutine on the loop and awaits it from another event loop.
+        """
+        return await asyncio.wrap_future(self.submit(coro))
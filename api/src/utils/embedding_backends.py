@@ -0,0 +1,129 @@
+import numpy as np
+import os
+
+DEFAULT_EMBEDDING_MODEL = 'multi-qa-MiniLM-L6-cos-v1'
+
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE = 'model_quantized.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+
+class SentenceTransformerBackend:
+    """
+    Embedding backend running the sentence-transformers (torch) model.
+    """
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(list(texts), batch_size=batch_size)
+
+
+class OnnxEmbeddingBackend:
+    """
+    CPU embedding backend running an ONNX export of a sentence-transformers model with ONNX Runtime.
+    Applies the same mean pooling and L2 normalization as the sentence-transformers pipeline of the MiniLM models, so its vectors are compatible with the stored ones.
+    """
+
+    def __init__(self, model_dir, quantized=False, max_length=512):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_file = ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        embeddings = []
+
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+            }
+            inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            mask = inputs["attention_mask"][..., np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+            embeddings.append(pooled.astype(np.float32))
+
+        return np.vstack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+
+def load_embedding_backend(model_name, backend="torch", onnx_path=None, quantized=False):
+    """
+    Returns the embedding backend selected by name. ONNX models are looked up in <onnx_path>/<model_name>, as written by export_onnx_model.
+    """
+    if backend == "onnx":
+        if not onnx_path:
+            raise ValueError('The onnx embedding backend requires EMBEDDING_ONNX_PATH, the directory written by setup/export_onnx_model.py')
+        model_dir = os.path.join(onnx_path, model_name)
+        if not os.path.isdir(model_dir):
+            raise ValueError(f'ONNX model not found in {model_dir}, export it with setup/export_onnx_model.py')
+        return OnnxEmbeddingBackend(model_dir, quantized=quantized)
+    elif backend == "torch":
+        return SentenceTransformerBackend(model_name)
+    else:
+        raise ValueError(f'Unknown embedding backend: {backend}')
+
+
+def export_onnx_model(model_name, output_dir, quantize=True):
+    """
+    Exports the transformer of a sentence-transformers model to ONNX, along with its tokenizer.
+    With quantize=True an int8 dynamically quantized copy of the model is written next to it.
+    Requires torch, transformers and onnx, which are not needed to run the exported model.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    hub_name = model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name)
+    model.eval()
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+
+    dummy = tokenizer(["a sample sentence"], return_tensors='pt')
+    input_names = [name for name in ["input_ids", "attention_mask", "token_type_ids"] if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+    return output_dir
@@ -0,0 +1,103 @@
+import asyncio
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.background_loop import BackgroundLoop
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher in front of an embedding model.
+    Encode requests from concurrent callers are collected for up to max_wait_ms or max_batch_size texts, encoded in a single batched call in a worker thread, and each caller's future is resolved with its own vector.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=2, workers=1):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embedding-batcher')
+        self._background = BackgroundLoop('embedding-batcher-loop')
+        self._queue = self._background.run(self._create_queue())
+
+        for _ in range(workers):
+            self._background.submit(self._worker())
+
+    async def _create_queue(self):
+        return asyncio.Queue()
+
+    async def encode(self, text):
+        """
+        Returns the embedding of a single text. Must be awaited on the batcher's loop, use encode_many from other threads.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _encode_many(self, texts):
+        return await asyncio.gather(*[self.encode(text) for text in texts])
+
+    def encode_many(self, texts):
+        """
+        Returns the embeddings of the given texts as a matrix, blocking the calling thread.
+        """
+        vectors = self._background.run(self._encode_many(list(texts)))
+        return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    async def encode_many_async(self, texts):
+        """
+        Returns the embeddings of the given texts as a matrix, awaitable from any event loop.
+        """
+        vectors = await self._background.run_async(self._encode_many(list(texts)))
+        return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await self._next_batch()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(np.asarray(vector, dtype=np.float32))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0
+        }
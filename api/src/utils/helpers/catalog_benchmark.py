@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+import time
+
+# Compares load time and resident memory of the JSON TableManager and the CompactTableManager on the same tables file.
+# Each loader runs in its own process, so its memory is not mixed with the other one's.
+# Loading a catalog does not import config, so it runs without the database or OpenAI credentials.
+
+LOADERS = ["table_manager", "compact"]
+
+
+def _rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def run_loader(loader, tables_path, members_path=None):
+    from table_selection.compact_catalog import CompactTableManager
+    from table_selection.table import TableManager
+
+    rss_before = _rss_kb()
+    start_time = time.time()
+
+    if loader == "compact":
+        manager = CompactTableManager(tables_path, members_path)
+    else:
+        manager = TableManager(tables_path)
+
+    load_time = time.time() - start_time
+
+    return {
+        "loader": loader,
+        "tables": len(manager.tables),
+        "load_time": load_time,
+        "rss_kb": _rss_kb() - rss_before
+    }
+
+
+def main(tables_path, members_path=None):
+    results = []
+    for loader in LOADERS:
+        args = [sys.executable, "-m", "utils.helpers.catalog_benchmark", "--run", loader, tables_path] + ([members_path] if members_path else [])
+        output = subprocess.run(args, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    # both loaders read the "tables" key of the file, the comparison is only meaningful if they loaded the same catalog
+    table_counts = {result['loader']: result['tables'] for result in results}
+    if len(set(table_counts.values())) != 1 or not results[0]['tables']:
+        raise ValueError(f"The loaders did not load the same tables from {tables_path}: {table_counts}")
+
+    for result in results:
+        print(f"{result['loader']:>14}: {result['tables']} tables, load time {result['load_time']:.3f}s, resident memory {result['rss_kb'] / 1024:.1f} MB")
+
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--run":
+        print(json.dumps(run_loader(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)))
+    elif len(sys.argv) in (2, 3):
+        main(*sys.argv[1:])
+    else:
+        print("Usage (from api/src): python -m utils.helpers.catalog_benchmark <tables_file> [<members_dir>]")
+        sys.exit(1)
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class LLMResponseCache:
+    """
+    Cache of LLM responses for deterministic prompts, keyed by model, messages and catalog version.
+    Responses are kept in a bounded in-memory LRU and, if a path is given, in a local SQLite file shared across restarts.
+    Entries expire ttl seconds after being stored. get and put are coroutines: SQLite reads and writes run in worker threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=86400, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_responses (key text PRIMARY KEY, response text, expires_at real)")
+            self._db.execute("DELETE FROM llm_responses WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model, messages, catalog_version=None):
+        content = json.dumps({"model": model, "messages": messages, "catalog_version": catalog_version}, sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    async def get(self, key):
+        """
+        Returns the cached response, or None. The SQLite tier is read in a worker thread, so the event loop is not blocked.
+        """
+        response = self._get_memory(key)
+        if response is None and self._db is not None:
+            response = await asyncio.to_thread(self._get_disk, key)
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+        return response
+
+    async def put(self, key, response):
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._store(key, expires_at, response)
+
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, response, expires_at)
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return response
+
+    def _get_disk(self, key):
+        with self._db_lock:
+            row = self._db.execute("SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+
+        with self._lock:
+            self._store(key, row[1], row[0])
+            self.disk_hits += 1
+        return row[0]
+
+    def _put_disk(self, key, response, expires_at):
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO llm_responses (key, response, expires_at) VALUES (?, ?, ?)", (key, response, expires_at))
+            self._db.commit()
+
+    def _store(self, key, expires_at, response):
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0
+        }
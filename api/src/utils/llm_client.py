@@ -0,0 +1,127 @@
+import aiohttp
+import asyncio
+import openai
+import threading
+
+from config import (
+    LLM_CACHE, LLM_CACHE_PATH, LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_DEADLINE, LLM_HEDGE_QUANTILE, LLM_HEDGING, LLM_MAX_ATTEMPTS,
+    LLM_MAX_CONCURRENCY, LLM_POOL_SIZE, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY, LLM_TIMEOUT
+)
+from utils.background_loop import BackgroundLoop
+from utils.llm_cache import LLMResponseCache
+from utils.retry import RetryPolicy
+
+RETRYABLE_ERRORS = (
+    openai.error.Timeout,
+    openai.error.APIError,
+    openai.error.APIConnectionError,
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError
+)
+
+
+def create_retry_policy():
+    return RetryPolicy(
+        RETRYABLE_ERRORS,
+        max_attempts=LLM_MAX_ATTEMPTS,
+        base_delay=LLM_RETRY_BASE_DELAY,
+        max_delay=LLM_RETRY_MAX_DELAY,
+        deadline=LLM_DEADLINE,
+        attempt_timeout=LLM_TIMEOUT,
+        hedging=LLM_HEDGING,
+        hedge_quantile=LLM_HEDGE_QUANTILE
+    )
+
+
+class LLMClient:
+    """
+    Async client for the LLM calls of the pipeline.
+    All calls run on one background event loop and share a keep-alive aiohttp connection pool, with a cap on the number of
+    concurrent calls. Failed and slow calls are retried (and optionally hedged) by the retry policy. Coroutines using the
+    client must run on its loop: use run() from synchronous code and run_async() from other event loops.
+    Completions requested with temperature 0 are served from the response cache when one is given.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, pool_size=LLM_POOL_SIZE, retry_policy=None, cache=None):
+        self.retry_policy = retry_policy or create_retry_policy()
+        self.cache = cache
+        self._background = BackgroundLoop('llm-client-loop')
+        self._session, self._semaphore = self._background.run(self._setup(max_concurrency, pool_size))
+
+    async def _setup(self, max_concurrency, pool_size):
+        connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+        return aiohttp.ClientSession(connector=connector), asyncio.Semaphore(max_concurrency)
+
+    def run(self, coro):
+        return self._background.run(coro)
+
+    async def run_async(self, coro):
+        return await self._background.run_async(coro)
+
+    async def chat_completion(self, model, messages, temperature=0, catalog_version=None, call_site="chat"):
+        """
+        Requests a chat completion to OpenAI and returns the content of the first choice.
+        Raises RetryBudgetExceeded if no attempt succeeded within the retry policy's deadline.
+        call_site names the prompt (e.g. "table_selection"): latencies for hedging are tracked per model and call site.
+        catalog_version is part of the cache key, so cached responses are not reused after the catalog changes.
+        """
+        cache_key = None
+        if self.cache is not None and temperature == 0:
+            cache_key = self.cache.make_key(model, messages, catalog_version)
+            output_text = await self.cache.get(cache_key)
+            if output_text is not None:
+                return output_text
+
+        output_text = await self.retry_policy.call(
+            lambda timeout: self._chat_completion(model, messages, temperature, timeout), name=f"openai:{model}:{call_site}"
+            )
+
+        if cache_key is not None:
+            await self.cache.put(cache_key, output_text)
+
+        return output_text
+
+    async def _chat_completion(self, model, messages, temperature, timeout):
+        async with self._semaphore:
+            openai.aiosession.set(self._session)
+            response = await openai.ChatCompletion.acreate(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                request_timeout=timeout
+                )
+        return response['choices'][0]['message']['content']
+
+    async def post(self, url, payload, call_site="post"):
+        """
+        Posts a JSON payload (e.g. to the Ollama API) and returns the response text, with the same retry policy as chat completions.
+        """
+        return await self.retry_policy.call(
+            lambda timeout: self._post(url, payload, timeout), name=f"post:{payload.get('model')}:{call_site}"
+            )
+
+    async def _post(self, url, payload, timeout):
+        async with self._semaphore:
+            async with self._session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                return await response.text()
+
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """
+    Returns the process-wide LLMClient, creating it on first use.
+    """
+    global _llm_client
+
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                cache = LLMResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PATH) if LLM_CACHE else None
+                _llm_client = LLMClient(cache=cache)
+    return _llm_client
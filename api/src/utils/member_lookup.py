@@ -0,0 +1,154 @@
+import pandas as pd
+import threading
+import time
+
+from bisect import bisect_left
+from collections import Counter
+
+from config import MEMBER_LOOKUP_TTL, POSTGRES_ENGINE, SCHEMA_DRILLDOWNS, DRILLDOWNS_TABLE_NAME
+from utils.vector_index import get_drilldowns_index
+
+TRIGRAM_THRESHOLD = 0.6
+MIN_PREFIX_LENGTH = 3
+
+
+def fold(text):
+    """
+    Case-folds text and collapses whitespace, for case-insensitive member lookups.
+    """
+    return " ".join(str(text).split()).casefold()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LevelMembers:
+    """
+    Lexical lookups over the members of a level: exact name, case-folded name, unique prefix and trigram similarity.
+    """
+
+    def __init__(self, ids, names):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.folded_names = [fold(name) for name in self.names]
+
+        self.sorted_members = sorted(range(len(self.folded_names)), key=self.folded_names.__getitem__)
+        self.sorted_names = [self.folded_names[i] for i in self.sorted_members]
+
+        self.exact = {}
+        self.folded = {}
+        for i, (name, folded_name) in enumerate(zip(self.names, self.folded_names)):
+            self.exact.setdefault(name, i)
+            self.folded.setdefault(folded_name, i)
+
+        self._trigram_index = None
+        self._trigram_counts = None
+        self._lock = threading.Lock()
+
+    def match_exact(self, text):
+        i = self.exact.get(text)
+        if i is None:
+            i = self.folded.get(fold(text))
+        return i
+
+    def match_prefix(self, text):
+        """
+        Returns the only member whose name starts with the given text, if there is exactly one.
+        """
+        folded_text = fold(text)
+        if len(folded_text) < MIN_PREFIX_LENGTH:
+            return None
+
+        position = bisect_left(self.sorted_names, folded_text)
+        if position == len(self.sorted_names) or not self.sorted_names[position].startswith(folded_text):
+            return None
+        if position + 1 < len(self.sorted_names) and self.sorted_names[position + 1].startswith(folded_text):
+            return None
+        return self.sorted_members[position]
+
+    def match_trigram(self, text, threshold=TRIGRAM_THRESHOLD):
+        """
+        Returns the member with the highest trigram Jaccard similarity to the given text and its similarity, if it is above threshold and unique.
+        """
+        self._build_trigram_index()
+
+        text_trigrams = trigrams(fold(text))
+        shared = Counter()
+        for trigram in text_trigrams:
+            shared.update(self._trigram_index.get(trigram, ()))
+
+        best, best_score, tied = None, 0.0, False
+        for i, count in shared.items():
+            score = count / (len(text_trigrams) + self._trigram_counts[i] - count)
+            if score > best_score:
+                best, best_score, tied = i, score, False
+            elif score == best_score:
+                tied = True
+
+        if best is None or tied or best_score < threshold:
+            return None, 0.0
+        return best, best_score
+
+    def _build_trigram_index(self):
+        if self._trigram_index is not None:
+            return
+
+        with self._lock:
+            if self._trigram_index is not None:
+                return
+
+            index = {}
+            counts = []
+            for i, name in enumerate(self.folded_names):
+                name_trigrams = trigrams(name)
+                counts.append(len(name_trigrams))
+                for trigram in name_trigrams:
+                    index.setdefault(trigram, []).append(i)
+
+            self._trigram_counts = counts
+            self._trigram_index = index
+
+
+_level_members = {}
+_level_members_lock = threading.Lock()
+
+
+def get_level_members(table, drilldown):
+    """
+    Returns the LevelMembers of a level of a table, loaded from the member arrays of a compact catalog table,
+    from the drilldowns index or, if the level is in neither, from the drilldowns table.
+    Members are cached per catalog version for MEMBER_LOOKUP_TTL seconds.
+    """
+    cache_key = (table.catalog_version, table.name, drilldown)
+    cached = _level_members.get(cache_key)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+
+    key = (table.name, drilldown)
+
+    exported = table.get_level_members(drilldown) if hasattr(table, 'get_level_members') else None
+    index = get_drilldowns_index()
+    if exported is not None:
+        ids, names = exported
+        members = LevelMembers(ids.tolist(), names.tolist())
+    elif index is not None and key in index.members:
+        entry = index.members[key]
+        members = LevelMembers(entry["ids"], entry["names"])
+    else:
+        query = f"SELECT drilldown_id, drilldown_name FROM {SCHEMA_DRILLDOWNS}.{DRILLDOWNS_TABLE_NAME} WHERE cube_name = %(cube_name)s AND drilldown = %(drilldown)s"
+        df = pd.read_sql(query, con=POSTGRES_ENGINE, params={"cube_name": table.name, "drilldown": drilldown})
+        members = LevelMembers(df['drilldown_id'].astype(str), df['drilldown_name'].astype(str))
+
+    with _level_members_lock:
+        _level_members[cache_key] = (time.time() + MEMBER_LOOKUP_TTL, members)
+    return members
+
+
+def clear_level_members():
+    """
+    Drops the cached members of every level, so they are read again on the next lookup (e.g. after a catalog reload).
+    """
+    with _level_members_lock:
+        _level_members.clear()
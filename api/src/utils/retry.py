@@ -0,0 +1,132 @@
+import asyncio
+import random
+import time
+
+from collections import deque
+
+
+class RetryBudgetExceeded(Exception):
+    """
+    Raised when a call did not succeed within the retry policy's attempts or deadline.
+    """
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the latest successful calls to estimate their quantiles.
+    """
+
+    def __init__(self, window=200):
+        self._latencies = deque(maxlen=window)
+
+    def add(self, latency):
+        self._latencies.append(latency)
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def quantile(self, q):
+        latencies = sorted(self._latencies)
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+class RetryPolicy:
+    """
+    Retries an async call on the given errors with exponential backoff and full jitter, within a deadline for the whole call.
+    Each attempt gets the time left in the deadline as its timeout (capped by attempt_timeout).
+    With hedging, when an attempt has not answered after the hedge_quantile latency of recent calls with the same name, a duplicate
+    is sent and the first answer wins. Hedging starts once min_hedge_samples latencies have been observed for that name.
+    """
+
+    def __init__(self, retryable, max_attempts=5, base_delay=0.5, max_delay=8, deadline=120, attempt_timeout=None,
+                 hedging=False, hedge_quantile=0.95, min_hedge_samples=20):
+        self.retryable = retryable
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_samples = min_hedge_samples
+        self.latencies = {}
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "budget_exceeded": 0}
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, make_request, name="request"):
+        """
+        Runs make_request(timeout), a function returning a new coroutine for each attempt, until it succeeds.
+        name identifies the kind of call (e.g. model and call site): latencies are tracked separately for each name.
+        Raises RetryBudgetExceeded when the attempts or the deadline run out, chained to the last error.
+        """
+        self.counters["calls"] += 1
+        start_time = time.monotonic()
+        attempts = 0
+
+        while True:
+            remaining = self.deadline - (time.monotonic() - start_time)
+            timeout = min(remaining, self.attempt_timeout) if self.attempt_timeout else remaining
+
+            try:
+                return await self._attempt(make_request, timeout, name)
+            except self.retryable as e:
+                attempts += 1
+                elapsed = time.monotonic() - start_time
+                print(f"{name} failed (attempt {attempts}, {elapsed:.1f}s elapsed): {type(e).__name__} {e}")
+
+                delay = self.backoff(attempts)
+                if attempts >= self.max_attempts or elapsed + delay >= self.deadline:
+                    self.counters["budget_exceeded"] += 1
+                    raise RetryBudgetExceeded(
+                        f"{name} did not succeed after {attempts} attempts in {elapsed:.1f}s (deadline {self.deadline}s)"
+                    ) from e
+
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, make_request, timeout, name):
+        start_time = time.monotonic()
+        latencies = self.latencies.setdefault(name, LatencyTracker())
+        hedge_after = latencies.quantile(self.hedge_quantile) if self.hedging and len(latencies) >= self.min_hedge_samples else None
+
+        if hedge_after is None or hedge_after >= timeout:
+            result = await asyncio.wait_for(make_request(timeout), timeout)
+        else:
+            result = await self._hedged_attempt(make_request, timeout, hedge_after)
+
+        latencies.add(time.monotonic() - start_time)
+        return result
+
+    async def _hedged_attempt(self, make_request, timeout, hedge_after):
+        start_time = time.monotonic()
+        primary = asyncio.create_task(asyncio.wait_for(make_request(timeout), timeout))
+        tasks = [primary]
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                self.counters["hedges"] += 1
+                remaining = timeout - (time.monotonic() - start_time)
+                tasks.append(asyncio.create_task(asyncio.wait_for(make_request(remaining), remaining)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+            # every request failed: raise the error of the first one
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats["p95_latency"] = {name: latencies.quantile(0.95) for name, latencies in self.latencies.items() if len(latencies)}
+        return stats
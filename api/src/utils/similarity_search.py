@@ -1,17 +1,227 @@
+import atexit
+import numpy as np
 import pandas as pd
+import sqlite3
+import threading
+import time
 
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
 from typing import List
 
-from config import POSTGRES_ENGINE
+from config import EMBEDDING_BACKEND, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE, EMBEDDING_ONNX_PATH, EMBEDDING_ONNX_QUANTIZED, POSTGRES_ENGINE
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS
+from utils.embedding_backends import DEFAULT_EMBEDDING_MODEL, load_embedding_backend
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.vector_index import get_drilldowns_index
 
-def get_similar_content(text, cube_name, drilldown_names, threshold=0, content_limit=1, embedding_model='multi-qa-MiniLM-L6-cos-v1', verbose=False):
+# Models whose tokenizer lowercases its input, so lowercasing the text does not change the embedding
+UNCASED_EMBEDDING_MODELS = {DEFAULT_EMBEDDING_MODEL}
+
+# Process-wide registry of loaded embedding models, keyed by model name
+_embedding_models = {}
+_embedding_models_lock = threading.Lock()
+
+
+def get_embedding_model(embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """
+    Returns the embedding model with the given name, loading it from disk only the first time it is requested in the process.
+    The backend running the model (torch or ONNX Runtime) is selected with the EMBEDDING_BACKEND setting.
+    """
+    model = _embedding_models.get(embedding_model)
+    if model is None:
+        with _embedding_models_lock:
+            model = _embedding_models.get(embedding_model)
+            if model is None:
+                model = load_embedding_backend(embedding_model, EMBEDDING_BACKEND, EMBEDDING_ONNX_PATH, EMBEDDING_ONNX_QUANTIZED)  # 384
+                _embedding_models[embedding_model] = model
+    return model
+
+
+def warm_embedding_models(embedding_models=(DEFAULT_EMBEDDING_MODEL,)):
+    """
+    Loads the given embedding models into the registry ahead of the first request.
+    """
+    for embedding_model in embedding_models:
+        get_embedding_model(embedding_model)
+
+
+# Micro-batchers shared by concurrent requests, keyed by model name
+_embedding_batchers = {}
+_embedding_batchers_lock = threading.Lock()
+
+
+def start_embedding_batchers(embedding_models=(DEFAULT_EMBEDDING_MODEL,), max_batch_size=EMBEDDING_BATCH_SIZE, max_wait_ms=EMBEDDING_BATCH_WAIT_MS):
+    """
+    Puts a micro-batcher in front of each given model, so encode calls from concurrent requests are batched together.
+    """
+    for embedding_model in embedding_models:
+        model = get_embedding_model(embedding_model)
+        with _embedding_batchers_lock:
+            if embedding_model not in _embedding_batchers:
+                _embedding_batchers[embedding_model] = EmbeddingBatcher(model.encode, max_batch_size, max_wait_ms)
+
+
+def get_embedding_batcher(embedding_model=DEFAULT_EMBEDDING_MODEL):
+    return _embedding_batchers.get(embedding_model)
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed by (backend, model name, normalized text), with hit/miss counters.
+    The backend (e.g. "torch" or "onnx-int8") is part of the key, so vectors computed by another backend are not served after switching.
+    If a path is given, embeddings are also stored in a local SQLite file so they survive restarts. New embeddings are written to it
+    by a background thread every flush_interval seconds, in one transaction, so requests never wait for a commit.
+    """
+
+    def __init__(self, maxsize=10000, path=None, backend=EMBEDDING_BACKEND, flush_interval=1.0):
+        self.maxsize = maxsize
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._pending = {}
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (model text, text text, vector blob, PRIMARY KEY (model, text))")
+            self._db.commit()
+            threading.Thread(target=self._run_writer, name='embedding-cache-writer', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _key(self, embedding_model, text):
+        # stored in the model column of the SQLite table, as "<backend>:<model name>"
+        return (f"{self.backend}:{embedding_model}", normalize_text(text, embedding_model))
+
+    def get(self, embedding_model, text):
+        key = self._key(embedding_model, text)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                vector = self._pending.get(key)
+            if vector is not None:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE model = ? AND text = ?", key).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                with self._lock:
+                    self._store(key, vector)
+                    self.hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, embedding_model, text, vector):
+        key = self._key(embedding_model, text)
+        vector = np.asarray(vector, dtype=np.float32)
+
+        with self._lock:
+            self._store(key, vector)
+            if self._db is not None:
+                self._pending[key] = vector
+
+    def flush(self):
+        """
+        Writes the embeddings stored since the last flush to the SQLite file.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                [(*key, vector.tobytes()) for key, vector in pending.items()]
+            )
+            self._db.commit()
+
+    def _run_writer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Embedding cache flush failed: {e}")
+
+    def _store(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+def normalize_text(text, embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """
+    Normalizes text for embedding cache lookups: surrounding and repeated whitespace is removed, and text is lowercased for uncased models.
+    """
+    text = " ".join(str(text).split())
+    if embedding_model in UNCASED_EMBEDDING_MODELS:
+        text = text.lower()
+    return text
+
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH, "onnx-int8" if EMBEDDING_BACKEND == "onnx" and EMBEDDING_ONNX_QUANTIZED else EMBEDDING_BACKEND)
+
+
+def encode_texts(texts, embedding_model=DEFAULT_EMBEDDING_MODEL):
+    """
+    Returns the embeddings of the given texts as a matrix, one row per text.
+    Embeddings are looked up in the shared embedding cache first, and all misses are computed in a single encode call
+    (through the model's micro-batcher when one is running, where they may be batched with other requests).
+    """
+    vectors = [embedding_cache.get(embedding_model, text) for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    if missing:
+        batcher = get_embedding_batcher(embedding_model)
+        if batcher is not None:
+            encoded = batcher.encode_many([texts[i] for i in missing])
+        else:
+            encoded = get_embedding_model(embedding_model).encode([texts[i] for i in missing])
+        for i, vector in zip(missing, encoded):
+            embedding_cache.put(embedding_model, texts[i], vector)
+            vectors[i] = np.asarray(vector, dtype=np.float32)
+
+    return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+
+def get_similar_content(text, cube_name, drilldown_names, threshold=0, content_limit=1, embedding_model=DEFAULT_EMBEDDING_MODEL, verbose=False):
     """
     Receives a string, computes its embedding, and then looks for similar content in a database based on the given cube and drilldown levels.
     Returns top match, similarity score, and others depending on the drilldown.
     """
-    model = SentenceTransformer(embedding_model)  # 384
-    embedding = model.encode([text])
+    embedding = encode_texts([text], embedding_model)
+
+    index = get_drilldowns_index()
+    if index is not None and index.has(cube_name, drilldown_names):
+        matches = index.search(embedding[0], cube_name, drilldown_names, threshold, content_limit)
+
+        if verbose: print(matches)
+
+        return matches[0]
 
     drilldown_names_array = "{" + ",".join(map(lambda x: f'"{x}"', drilldown_names)) + "}"
  
@@ -30,24 +240,90 @@ def get_similar_content(text, cube_name, drilldown_names, threshold=0, content_l
     return drilldown_id, drilldown_name, similarity
 
 
-def get_similar_tables(vector, threshold=0, content_limit=1) -> List[str]:
+def get_similar_content_batch(texts, cube_name, drilldown_names_list, threshold=0, content_limit=1, embedding_model=DEFAULT_EMBEDDING_MODEL, verbose=False):
+    """
+    Batched version of get_similar_content. Receives a list of strings and, for each of them, the list of drilldown levels to search in.
+    Computes all embeddings in a single encode call and resolves every text in a single database query.
+    Texts whose levels are all in the drilldowns index are resolved in memory instead.
+    Returns a list of (drilldown_id, drilldown_name, similarity) tuples in the same order as the given texts.
+    """
+    if not texts:
+        return []
+
+    embeddings = encode_texts(list(texts), embedding_model)
+
+    results = [None] * len(texts)
+    pending = []
+
+    index = get_drilldowns_index()
+    for i, drilldown_names in enumerate(drilldown_names_list):
+        if index is not None and index.has(cube_name, drilldown_names):
+            matches = index.search(embeddings[i], cube_name, drilldown_names, threshold, content_limit)
+            if matches:
+                results[i] = matches[0]
+        else:
+            pending.append(i)
+
+    if pending:
+        _match_drilldowns_batch_in_database(results, pending, embeddings, cube_name, drilldown_names_list, threshold, content_limit, verbose)
+
+    missing = [texts[i] for i, result in enumerate(results) if result is None]
+    if missing:
+        raise ValueError(f'No similar content found in cube {cube_name} for: {missing}')
+
+    return results
+
+
+def _match_drilldowns_batch_in_database(results, pending, embeddings, cube_name, drilldown_names_list, threshold, content_limit, verbose=False):
+    """
+    Resolves the pending positions of results with a single call per text to match_drilldowns_aux, all in one query.
+    """
+    values = []
+    for i in pending:
+        vector, drilldown_names = embeddings[i], drilldown_names_list[i]
+        drilldown_names_array = "{" + ",".join(map(lambda x: f'"{x}"', drilldown_names)) + "}"
+        values.append("({}, '{}'::vector, '{}'::text[])".format(i, vector.tolist().__str__(), _escape_sql_literal(drilldown_names_array)))
+
+    query = """select q.idx, m.product_id, m.drilldown_name, m.similarity from (values {}) as q(idx, embedding, drilldown_names) cross join lateral "match_drilldowns_aux"(q.embedding, {}, {}, '{}', q.drilldown_names) as m order by q.idx, m.similarity desc; """.format(
+        ", ".join(values), str(threshold), str(content_limit), _escape_sql_literal(str(cube_name)))
+
+    if verbose: print(query)
+
+    df = pd.read_sql(query, con=POSTGRES_ENGINE)
+
+    if verbose: print(df)
+
+    for row in df.itertuples(index=False):
+        if results[row.idx] is None:
+            results[row.idx] = (row.product_id, row.drilldown_name, row.similarity)
+
+
+def _escape_sql_literal(value):
+    return value.replace("'", "''")
+
+
+def get_similar_tables(vector, threshold=0, content_limit=1, with_scores=False) -> List[str]:
     """
     Receives a string, computes its embedding and then looks for similar content in a database. 
-    Returns top match, similarity score, and others depending on the drilldown.
+    Returns the names of the top matches, or (name, similarity) pairs if with_scores is set.
     """
     query = """select table_name, similarity from "match_table"('{}','{}' ,'{}'); """.format(vector[0].tolist().__str__(), str(threshold), str(content_limit))
     
     df = pd.read_sql(query, con=POSTGRES_ENGINE)
+
+    if with_scores:
+        return list(zip(df['table_name'].tolist(), df['similarity'].astype(float).tolist()))
+
     tables = df['table_name'].tolist()
 
     return tables
 
 
-def embedding(dataframe, column):
+def embedding(dataframe, column, embedding_model=DEFAULT_EMBEDDING_MODEL):
     """
     Creates embeddings for text in the column passed as argument
     """
-    model = SentenceTransformer('multi-qa-MiniLM-L6-cos-v1')
+    model = get_embedding_model(embedding_model)
 
     model_embeddings = model.encode(dataframe[column].to_list())
     dataframe['embedding'] = model_embeddings.tolist()
@@ -0,0 +1,186 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+import threading
+
+from config import POSTGRES_ENGINE, SCHEMA_DRILLDOWNS, DRILLDOWNS_TABLE_NAME
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+MEMBERS_FILE = 'members.json'
+
+
+class DrilldownIndex:
+    """
+    In-memory index of drilldown member embeddings.
+    Rows of the embeddings matrix are L2-normalized and grouped by (cube, level), so a cosine similarity search over a level is a single matrix-vector product.
+    """
+
+    def __init__(self, embeddings, members):
+        self.embeddings = embeddings
+        self.members = members
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Builds the index from a dataframe with drilldown_id, drilldown_name, cube_name, drilldown and embedding columns.
+        """
+        df = df.sort_values(['cube_name', 'drilldown'], kind='stable').reset_index(drop=True)
+
+        embeddings = np.vstack([_parse_vector(vector) for vector in df['embedding']]).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        embeddings /= norms
+
+        members = {}
+        for (cube_name, drilldown), group in df.groupby(['cube_name', 'drilldown'], sort=False):
+            members[(cube_name, drilldown)] = {
+                "start": int(group.index[0]),
+                "end": int(group.index[-1]) + 1,
+                "ids": group['drilldown_id'].astype(str).tolist(),
+                "names": group['drilldown_name'].astype(str).tolist()
+            }
+
+        return cls(embeddings, members)
+
+    @classmethod
+    def from_database(cls, schema_name=SCHEMA_DRILLDOWNS, table_name=DRILLDOWNS_TABLE_NAME):
+        query = """select drilldown_id, drilldown_name, cube_name, drilldown, embedding from {}.{}; """.format(schema_name, table_name)
+        df = pd.read_sql(query, con=POSTGRES_ENGINE)
+        return cls.from_dataframe(df)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index exported with save(). The embeddings matrix is memory-mapped instead of read into memory.
+        """
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode='r')
+
+        with open(os.path.join(path, MEMBERS_FILE), 'r') as f:
+            data = json.load(f)
+
+        members = {(entry.pop("cube"), entry.pop("level")): entry for entry in data}
+
+        return cls(embeddings, members)
+
+    def save(self, path):
+        """
+        Writes the index to path. Each file is written to a temporary file and then renamed, so a running API that has the previous
+        embeddings memory-mapped keeps reading them, and the members file (which refresh_drilldowns_index watches) is replaced last.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE)
+        with open(embeddings_path + '.tmp', 'wb') as f:
+            np.save(f, np.asarray(self.embeddings, dtype=np.float32))
+        os.replace(embeddings_path + '.tmp', embeddings_path)
+
+        members_path = os.path.join(path, MEMBERS_FILE)
+        data = [{"cube": cube_name, "level": drilldown, **entry} for (cube_name, drilldown), entry in self.members.items()]
+        with open(members_path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(members_path + '.tmp', members_path)
+
+    def has(self, cube_name, drilldown_names):
+        """
+        Returns True if every given level of the cube is present in the index.
+        """
+        return bool(drilldown_names) and all((cube_name, drilldown) in self.members for drilldown in drilldown_names)
+
+    def search(self, vector, cube_name, drilldown_names, threshold=0, content_limit=1):
+        """
+        Returns the top matches for the given vector among the members of the given levels, as a list of (drilldown_id, drilldown_name, similarity) tuples.
+        Like the match_drilldowns functions in the database, drilldown_name is the level the member belongs to.
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        ids, levels, scores = [], [], []
+        for drilldown in drilldown_names:
+            entry = self.members[(cube_name, drilldown)]
+            level_scores = self.embeddings[entry["start"]:entry["end"]] @ vector
+            ids.extend(entry["ids"])
+            levels.extend([drilldown] * len(entry["ids"]))
+            scores.append(level_scores)
+
+        if not ids:
+            return []
+
+        scores = np.concatenate(scores)
+        candidates = np.flatnonzero(scores > threshold)
+
+        if len(candidates) > content_limit:
+            top = np.argpartition(-scores[candidates], content_limit - 1)[:content_limit]
+            candidates = candidates[top]
+
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        return [(ids[i], levels[i], float(scores[i])) for i in candidates]
+
+
+def _parse_vector(vector):
+    """
+    Parses a pgvector value, which is returned as a '[x,y,...]' string unless an adapter is registered.
+    """
+    if isinstance(vector, str):
+        return np.array(vector.strip('[]').split(','), dtype=np.float32)
+    return np.asarray(vector, dtype=np.float32)
+
+
+_drilldowns_index = None
+_drilldowns_index_path = None
+_drilldowns_index_mtime = None
+_drilldowns_index_lock = threading.Lock()
+
+
+def get_drilldowns_index():
+    """
+    Returns the process-wide drilldowns index, or None if it has not been loaded.
+    """
+    return _drilldowns_index
+
+
+def _index_mtime(path):
+    return os.stat(os.path.join(path, MEMBERS_FILE)).st_mtime_ns
+
+
+def load_drilldowns_index(path=None):
+    """
+    Loads the process-wide drilldowns index.
+    If path points to an exported index it is memory-mapped, otherwise the index is built from the drilldowns table (and exported to path, if given).
+    """
+    global _drilldowns_index, _drilldowns_index_path, _drilldowns_index_mtime
+
+    with _drilldowns_index_lock:
+        if path and os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+            index = DrilldownIndex.load(path)
+        else:
+            index = DrilldownIndex.from_database()
+            if path:
+                index.save(path)
+
+        _drilldowns_index = index
+        _drilldowns_index_path = path
+        _drilldowns_index_mtime = _index_mtime(path) if path else None
+        print(f"Drilldowns index loaded: {len(index.members)} levels, {index.embeddings.shape[0]} members")
+
+    return index
+
+
+def refresh_drilldowns_index():
+    """
+    Reloads the process-wide drilldowns index if its exported files changed since it was loaded, e.g. after export_drilldowns_index.py
+    was run again following an ingestion. An index built from the database without a path is not refreshed.
+    Returns True if the index was reloaded.
+    """
+    path = _drilldowns_index_path
+    if _drilldowns_index is None or not path or not os.path.exists(os.path.join(path, MEMBERS_FILE)):
+        return False
+
+    if _index_mtime(path) == _drilldowns_index_mtime:
+        return False
+
+    load_drilldowns_index(path)
+    return True
@@ -0,0 +1,122 @@
+import numpy as np
+import re
+import threading
+
+from config import INTENT_CLASSIFIER_K, INTENT_CLASSIFIER_MARGIN, INTENT_CLASSIFIER_METHOD, INTENT_CLASSIFIER_THRESHOLD
+from utils.similarity_search import DEFAULT_EMBEDDING_MODEL, encode_texts
+
+
+class LowConfidenceError(ValueError):
+    """
+    Raised when the intent classifier is not confident enough, so the LLM classifier is used instead.
+    """
+
+
+def category_texts(category):
+    """
+    Texts describing a category from wrapper_datausa.json (or the base cases): its name, its elements and its examples.
+    """
+    texts = [category['name']]
+    elements = category.get('metrics', []) + category.get('vars', []) + category.get('optional_vars', [])
+    if elements:
+        texts.append('{}: {}'.format(category['name'], ', '.join(e.strip() for e in elements)))
+    texts.extend(category.get('examples', []))
+    return texts
+
+
+def user_messages(history):
+    """
+    Extract the user messages from a conversation formatted as in Langbot, e.g. " [AI]:Hi; [User]:Who is the president?[.]"
+    """
+    parts = re.split(r'\s*\[(AI|User)\]:', re.sub(r'\[\.\]$', '', history.strip()))
+    messages = [text.strip(' ;') for role, text in zip(parts[1::2], parts[2::2]) if role == 'User']
+    return [m for m in messages if m]
+
+
+class IntentClassifier:
+    """
+    Classifies a question into the Langbot categories by the cosine similarity of its embedding to the category texts.
+    With method "centroid" the question is compared to the mean vector of each category, and with "knn" each category is
+    scored by the mean similarity of its k nearest texts to the question.
+    classify raises LowConfidenceError when the best score is under threshold or the margin to the second category is under margin.
+    """
+
+    def __init__(self, categories, method=INTENT_CLASSIFIER_METHOD, k=INTENT_CLASSIFIER_K, threshold=INTENT_CLASSIFIER_THRESHOLD,
+                 margin=INTENT_CLASSIFIER_MARGIN, embedding_model=DEFAULT_EMBEDDING_MODEL):
+        if method not in ("centroid", "knn"):
+            raise ValueError(f"Unknown intent classifier method {method}, expected 'centroid' or 'knn'")
+
+        self.method = method
+        self.k = k
+        self.threshold = threshold
+        self.margin = margin
+        self.embedding_model = embedding_model
+        self.names = [c['name'] for c in categories]
+
+        texts = [category_texts(c) for c in categories]
+        self.labels = np.array([i for i, category in enumerate(texts) for _ in category])
+        self.vectors = self._normalize(encode_texts([text for category in texts for text in category], embedding_model))
+        self.centroids = self._normalize(np.vstack([self.vectors[self.labels == i].mean(axis=0) for i in range(len(self.names))]))
+
+    @staticmethod
+    def _normalize(vectors):
+        return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+    def scores(self, question):
+        """
+        Returns the score of each category for the question.
+        """
+        vector = self._normalize(encode_texts([question], self.embedding_model)[0])
+
+        if self.method == "centroid":
+            return self.centroids @ vector
+
+        similarities = self.vectors @ vector
+        scores = np.full(len(self.names), -1.0)
+        for i in range(len(self.names)):
+            category_similarities = similarities[self.labels == i]
+            top = np.sort(category_similarities)[-self.k:]
+            scores[i] = top.mean()
+        return scores
+
+    def predict(self, question):
+        """
+        Returns (category, score, margin) for the question, without the confidence check.
+        """
+        scores = self.scores(question)
+        order = np.argsort(-scores)
+        margin = float(scores[order[0]] - scores[order[1]]) if len(order) > 1 else float(scores[order[0]])
+        return self.names[order[0]], float(scores[order[0]]), margin
+
+    def classify(self, question):
+        """
+        Returns an object with question and category properties, like the LLM classification chains.
+        """
+        if not question:
+            raise LowConfidenceError("Empty question")
+
+        category, score, margin = self.predict(question)
+
+        if score < self.threshold or margin < self.margin:
+            raise LowConfidenceError(f"Low confidence for '{question}': {category} (score {score:.3f}, margin {margin:.3f})")
+
+        print(f"Intent classifier: {category} (score {score:.3f}, margin {margin:.3f})")
+        return {'question': question, 'category': category}
+
+
+_intent_classifiers = {}
+_intent_classifiers_lock = threading.Lock()
+
+
+def get_intent_classifier(categories, **kwargs):
+    """
+    Returns the classifier for the given categories, built on first use.
+    """
+    key = (tuple(c['name'] for c in categories), tuple(sorted(kwargs.items())))
+
+    with _intent_classifiers_lock:
+        classifier = _intent_classifiers.get(key)
+        if classifier is None:
+            classifier = IntentClassifier(categories, **kwargs)
+            _intent_classifiers[key] = classifier
+    return classifier
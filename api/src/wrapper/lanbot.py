@@ -1,13 +1,17 @@
 from langchain_community.llms import Ollama
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableSequence, RunnablePassthrough, RunnableLambda, RunnableParallel, chain
+from langchain_core.runnables import Runnable, chain
 from langchain_core.output_parsers import JsonOutputParser
+from wrapper.intent_classifier import get_intent_classifier, user_messages
 from wrapper.logsHandlerCallback import logsHandler
+from config import INTENT_CLASSIFIER
 from langchain.globals import set_debug, set_verbose
 from os import getenv
 import json
-from operator import itemgetter
+import queue
+import threading
+import time
 
 #set_debug(True)
 #set_verbose(True)
@@ -114,6 +118,13 @@ base_cases =  [
 
 category_prompts = category_prompts + base_cases
 
+# Extra examples for the local intent classifier only, the LLM classifier prompts are built from category_prompts
+intent_examples = {
+    'Greetings': ['Hi', 'Hello!', 'Good morning'],
+}
+
+intent_categories = [dict(c, examples=c.get('examples', []) + intent_examples.get(c['name'], [])) for c in category_prompts]
+
 #print(json.dumps(category_prompts, indent = 4))
 
 classify_prompt = PromptTemplate.from_template(
@@ -160,6 +171,7 @@ def class_parser(info):
 def stream_acc(info):
     """
     Prevent LLMs to stream (stutter) within a langchain chain. Use after the LLM.
+    Used in the classification chains, whose JSON output is only useful once complete.
     """
     print('In stream agg: {}'.format(info))
     return info
@@ -179,6 +191,24 @@ classifyTwo = classify_prompt.pipe(model_adv.bind(
         ).pipe(class_parser) 
 
 
+@chain
+def classifyLocal(info):
+    """
+    Classify the user messages with the local embedding classifier. Raises LowConfidenceError, so the LLM classifiers are used, when it is not confident.
+    * @param {object} info object with history property
+    * @returns object with question and category properties
+    """
+    question = ' '.join(user_messages(info['history']))
+    return get_intent_classifier(intent_categories).classify(question)
+
+
+def load_intent_classifier():
+    """
+    Builds the local intent classifier, so the first request does not wait for the category texts to be embedded.
+    """
+    return get_intent_classifier(intent_categories)
+
+
 def route(info):
     """
     Route prompts for categories from classify_num chain
@@ -212,73 +242,158 @@ def route(info):
         return 'DataUSA does not have information regarding that topic, please ask another question'
 
 
-def action(init):
+def message_event(content):
+    """
+    Complete message for the client, one JSON object per line
+    """
+    return json.dumps({'type': 'message', 'content': content}) + '\n'
+
+
+def token_event(token):
+    """
+    Partial tokens of the message being generated, one JSON object per line
+    """
+    return json.dumps({'type': 'token', 'content': token}) + '\n'
+
+
+def stream_answer(answer_chain, info, config):
+    """
+    Stream the answer of a category chain. Plain text chains (Greetings) are streamed as they come, and JSON chains
+    stream the missing elements once the answer can no longer be 'complete'.
+    * @param {*} answer_chain chain returned by route
+    * @param {*} info object with question and category properties
+    * @returns generator of events, returns the final chain output
+    """
+    output = None
+    sent = None
+    prefix = 'please, specify in your question: '
+
+    for chunk in answer_chain.stream(info, config=config):
+        if isinstance(chunk, str):
+            output = (output or '') + chunk
+            yield token_event(chunk)
+            continue
+
+        output = chunk
+        answer = chunk.get('answer') if isinstance(chunk, dict) else None
+        if not isinstance(answer, str) or not answer:
+            continue
+
+        if sent is None and not 'complete'.startswith(answer.lower()):
+            yield token_event(prefix + answer)
+            sent = len(answer)
+        elif sent is not None and len(answer) > sent:
+            yield token_event(answer[sent:])
+            sent = len(answer)
+
+    return output
+
+
+def action(info, handleQuery, args, config=None):
     """
     Call API or pass previous step messages
-    * @param {*} init object with line and input property
-    * @returns return object with content property as chain output
+    * @param {*} info object with question and action properties
+    * @returns generator of token and message events, the message content being the chain output
     """
-    info = init['line']
     print('In action fn: {}'.format([(k, info[k]) for k in info.keys()]))
 
-    handleQuery = init['input']['handleQuery']
-    args = init['input']['pass_args']
+    answer = info['action']
 
-    if isinstance(info['action'], dict) and 'answer' in info['action'].keys():
-        if info['action']['answer'].lower() == 'complete':
+    if isinstance(answer, Runnable):
+        answer = yield from stream_answer(answer, info['classification'], config)
 
-            yield json.dumps({'content': "Good question! let's check the data..."})
-            #resp = '...'
+    if isinstance(answer, dict) and 'answer' in answer.keys():
+        if answer['answer'].lower() == 'complete':
+
+            yield message_event("Good question! let's check the data...")
             searchText = info['question'].split(':')[-1]
             print(searchText)
 
-            #### Call get_query
-            resp = handleQuery(searchText, *args)
-
-            yield json.dumps({ 'content': resp})
+            #### Call get_query, the final answer tokens are passed through a queue while it runs
+            yield from stream_query(handleQuery, searchText, args)
 
         else:
             # ask for additional info
-            yield json.dumps({'content': 'please, specify in your question: {}'.format(info['action']['answer'])})
+            yield message_event('please, specify in your question: {}'.format(answer['answer']))
     else:
         # pass 
-        yield json.dumps({'content': info['action']})
+        yield message_event(answer)
 
 
-### Main chain
-altern_chain = RunnableSequence(
-                RunnableParallel({
-                    'line': (
-                                classifyOne.with_fallbacks(fallbacks = [classifyTwo]) 
-                                | {
-                                    'question': itemgetter("question"),
-                                    'action': RunnableLambda(route),
-                                }
-                            ),
-                    'input': RunnablePassthrough()
-                })
-                | RunnableLambda(action),
-            )
+_DONE = object()
+
+
+def stream_query(handleQuery, searchText, args):
+    """
+    Run handleQuery in a thread, streaming the tokens it reports through on_token and then its result.
+    """
+    tokens = queue.Queue()
+    result = {}
+
+    def run():
+        try:
+            result['value'] = handleQuery(searchText, *args, on_token=tokens.put)
+        except Exception as e:
+            result['error'] = e
+        finally:
+            tokens.put(_DONE)
 
+    threading.Thread(target=run, daemon=True).start()
+
+    token = tokens.get()
+    while token is not _DONE:
+        yield token_event(token)
+        token = tokens.get()
+
+    if 'error' in result:
+        raise result['error']
+
+    yield message_event(result['value'])
+
+
+### Main chain
+if INTENT_CLASSIFIER:
+    classify_chain = classifyLocal.with_fallbacks(fallbacks = [classifyOne, classifyTwo])
+else:
+    classify_chain = classifyOne.with_fallbacks(fallbacks = [classifyTwo])
 
 
 def Langbot(newMessage, handleQuery, logger=[], *args):
     """
     Activate chain to reflect upon user chat history to ask more information or to pass to get_query chain or other function.
+    Yields newline-delimited JSON events: 'token' events with partial text of the answer being generated, and 'message' events with complete messages.
     """
+    start_time = time.time()
+    first_message = True
+    first_token = True
+    config = {'callbacks':[logsHandler(logger, print_logs = True, print_starts=False)]}
+
     newChatMessageHistory = ChatMessageHistory()
     newChatMessageHistory.add_ai_message('Hi, ready to help you')
     newChatMessageHistory.add_user_message(newMessage)
 
-    for ans in altern_chain.stream({
+    classification = classify_chain.invoke({
         'history': ';'.join([f"{' [AI]' if m.lc_id()[2]=='AIMessage' else ' [User]'}:{m.content}"
-                            for m in newChatMessageHistory.messages]) + '[.]',
-        'handleQuery': handleQuery,
-        'pass_args': args
+                            for m in newChatMessageHistory.messages]) + '[.]'
         },
-        config={'callbacks':[logsHandler(logger, print_logs = True, print_starts=False)]}):
-        yield ans
-    #print('\n\n>>>>>>>>>>>>>  ', logger)
-    
+        config=config)
 
+    info = {
+        'question': classification['question'],
+        'action': route(classification),
+        'classification': classification
+    }
 
+    for event in action(info, handleQuery, args, config):
+        if json.loads(event)['type'] == 'token':
+            if first_token:
+                print('Time to first token: {:.3f}s'.format(time.time() - start_time))
+                first_token = False
+        elif first_message:
+            print('Time to first message: {:.3f}s'.format(time.time() - start_time))
+            first_message = False
+        yield event
+
+    print('Total time: {:.3f}s'.format(time.time() - start_time))
+    #print('\n\n>>>>>>>>>>>>>  ', logger)
+    
@@ -1,6 +1,51 @@
 const NEXT_PUBLIC_CHAT_API = process.env.NEXT_PUBLIC_CHAT_API;
 
 
+/**
+ * Handle one event from the API: 'token' events append partial text to the message being generated,
+ * 'message' events replace it with the complete message (or add a new one)
+ * @param {*} line JSON event
+ * @param {*} handleTable function to handle table response from API
+ * @param {*} updater  function to handle setMessegas
+ * @param {*} setLoading function to handle loading 
+ */
+function handleEvent(line, handleTable, updater, setLoading) {
+    const jsonStr = line.replace(/^data: /, '').trim();
+    if (!jsonStr) {
+        return;
+    }
+    try {
+        const resp = JSON.parse(jsonStr);
+        if (resp.type === 'token') {
+            updater((prevMessages) => {
+                const last = prevMessages[prevMessages.length - 1];
+                if (last && last.streaming) {
+                    return [...prevMessages.slice(0, -1), { ...last, text: last.text + resp.content }];
+                }
+                return [...prevMessages, { text: resp.content, user: false, streaming: true }];
+            });
+            return;
+        }
+
+        let text = resp.content;
+        if (Array.isArray(resp.content) && resp.content.length === 3) {
+            handleTable(resp.content[0]);
+            text = resp.content[2];
+        }
+        updater((prevMessages) => {
+            const last = prevMessages[prevMessages.length - 1];
+            if (last && last.streaming) {
+                return [...prevMessages.slice(0, -1), { text: text, user: false }];
+            }
+            return [...prevMessages, { text: text, user: false }];
+        });
+    } catch (error) {
+        console.error(error);
+        setLoading(false);
+    }
+}
+
+
 /**
  * Handle streaming response from FASTAPI Datausa-chat API wrapper
  * @param {*} input question input
@@ -20,27 +65,21 @@ export default async function ReflectionWrap(input, handleTable, updater, setLoa
         if(response.body){
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
+            let buffer = '';
             while (true) {
                 const {done, value} = await reader.read();
                 if (done){
                     break;
                 }
-                const str = decoder.decode(value);
-                try {
-                    const jsonStr = str.replace(/^data: /, '').trim();
-                    const resp = JSON.parse(jsonStr);
-                    if (resp.content.length === 3 ) {
-                        handleTable(resp.content[0]);
-                        updater((prevMessages) => [...prevMessages, { text: resp.content[2], user: false }]);
-                    } else {
-                        updater((prevMessages) => [...prevMessages, { text: resp.content, user: false }]);
-                    }
-
-                } catch (error) {
-                    console.error(error);
-                    setLoading(false);
-                } 
+                // events are newline-delimited JSON, a read may hold several events or part of one
+                buffer += decoder.decode(value, {stream: true});
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    handleEvent(line, handleTable, updater, setLoading);
+                }
             }
+            handleEvent(buffer, handleTable, updater, setLoading);
             setLoading(false);
         }
     } catch (error) {